@@ -0,0 +1,93 @@
+import asyncio
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from .scheduler import Scheduler, TimerHandle, default_scheduler
+
+if TYPE_CHECKING:
+    from .query import QueryKey
+
+BatchFn = Callable[
+    [List["QueryKey"]],
+    Awaitable[Union[Mapping["QueryKey", Any], Sequence[Any]]],
+]
+
+
+class BatchFetcher:
+    """
+    Collects the keys loaded within `window` milliseconds and fetches them
+    with a single call to `fn`.
+
+    `fn` receives the list of keys and returns either a mapping from key to
+    data or a sequence of data in the order of the keys. A returned exception
+    instance, or a key missing from the mapping, fails only that key.
+    """
+
+    def __init__(
+        self,
+        fn: BatchFn,
+        max_batch: int = 100,
+        window: int = 5,
+        scheduler: Optional[Scheduler] = None,
+    ):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.window = window
+        self.scheduler = scheduler if scheduler is not None else default_scheduler
+
+        self._pending: Dict["QueryKey", asyncio.Future] = {}
+        self._timer: Optional[TimerHandle] = None
+
+    async def load(self, key: "QueryKey") -> Any:
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self.dispatch()
+            elif self._timer is None:
+                self._timer = self.scheduler.call_later(self.window, self.dispatch)
+        return await asyncio.shield(future)
+
+    def dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = self._pending
+        self._pending = {}
+        if batch:
+            asyncio.ensure_future(self._fetch(batch))
+
+    async def _fetch(self, batch: Dict["QueryKey", asyncio.Future]) -> None:
+        keys = list(batch)
+        try:
+            values = await self.fn(keys)
+        except Exception as error:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        if not isinstance(values, Mapping):
+            values = dict(zip(keys, values))
+
+        for key, future in batch.items():
+            if future.done():
+                continue
+            if key not in values:
+                future.set_exception(KeyError(key))
+            elif isinstance(values[key], Exception):
+                future.set_exception(values[key])
+            else:
+                future.set_result(values[key])
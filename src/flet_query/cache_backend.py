@@ -0,0 +1,252 @@
+import asyncio
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, List, Optional
+
+from .change_notifier import ChangeNotifier
+from .persister import DehydratedQuery
+from .scheduler import Scheduler, TimerHandle, default_scheduler
+from .type import CacheChangeType
+
+if TYPE_CHECKING:
+    from .query import QueryKey
+
+
+@dataclass
+class CacheChange:
+    type: CacheChangeType
+    key: "QueryKey"
+    exact: bool = False
+
+
+CacheChangeListener = Callable[[CacheChange], None]
+
+
+class CacheBackend(ChangeNotifier[CacheChangeListener]):
+    """
+    Storage shared by the query caches of several processes.
+
+    A `QueryCache` with a backend writes the successful results of its
+    queries to it, seeds new queries from it and forwards invalidations to
+    it. Listeners are notified of the changes made by the other processes
+    only, on the event loop.
+
+    The cache calls the methods on `executor`, a single worker thread, so
+    they may block on I/O and run in the order they were called.
+    """
+
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="flet-query-backend",
+            )
+        return self._executor
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> "asyncio.Future[Any]":
+        """Call `fn` on the worker thread from the event loop."""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, fn, *args)
+
+    def get(self, key: "QueryKey") -> Optional[DehydratedQuery]:
+        raise NotImplementedError
+
+    def set(self, entry: DehydratedQuery) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: "QueryKey") -> None:
+        raise NotImplementedError
+
+    def invalidate(self, prefix: "QueryKey", exact: bool = False) -> None:
+        """Drop the entries under `prefix` and invalidate them everywhere."""
+        raise NotImplementedError
+
+
+def encode_key_path(key: "QueryKey") -> str:
+    """
+    Encode a key so that the keys under a prefix share its encoding as a
+    string prefix.
+    """
+    # repr() escapes control characters, so segments never contain \x1f.
+    return "".join(f"{segment!r}\x1f" for segment in key)
+
+
+class SqliteCacheBackend(CacheBackend):
+    """
+    Shares a cache between the processes of one machine through a SQLite
+    database in WAL mode.
+
+    Changes are appended to a log table, which each backend polls every
+    `poll_interval` milliseconds while it has listeners, on its worker
+    thread. Log rows older than `retention` milliseconds are pruned.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "flet_query_cache",
+        poll_interval: int = 500,
+        retention: int = 60000,
+        scheduler: Optional[Scheduler] = None,
+    ):
+        super().__init__()
+        self.path = path
+        self.table = table
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.scheduler = scheduler if scheduler is not None else default_scheduler
+        self.source = uuid.uuid4().hex
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "path TEXT PRIMARY KEY, key BLOB, data BLOB, data_updated_at REAL)"
+        )
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table}_changes ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT, type TEXT, "
+            "key BLOB, exact INTEGER, created_at REAL)"
+        )
+        row = self._connection.execute(
+            f"SELECT MAX(id) FROM {table}_changes"
+        ).fetchone()
+        self._last_change_id: int = row[0] or 0
+        self._pruned_at = 0.0
+        self._poll_timer: Optional[TimerHandle] = None
+
+    def get(self, key: "QueryKey") -> Optional[DehydratedQuery]:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT data, data_updated_at FROM {self.table} WHERE path = ?",
+                (encode_key_path(key),),
+            ).fetchone()
+        if row is None:
+            return None
+        data, data_updated_at = row
+        return DehydratedQuery(
+            key=key,
+            data=pickle.loads(data),
+            data_updated_at=datetime.fromtimestamp(data_updated_at),
+        )
+
+    def set(self, entry: DehydratedQuery) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (
+                    encode_key_path(entry.key),
+                    pickle.dumps(entry.key),
+                    pickle.dumps(entry.data),
+                    entry.data_updated_at.timestamp(),
+                ),
+            )
+            self._log(CacheChange(CacheChangeType.set, entry.key))
+
+    def delete(self, key: "QueryKey") -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"DELETE FROM {self.table} WHERE path = ?",
+                (encode_key_path(key),),
+            )
+            self._log(CacheChange(CacheChangeType.delete, key))
+
+    def invalidate(self, prefix: "QueryKey", exact: bool = False) -> None:
+        path = encode_key_path(prefix)
+        with self._lock, self._connection:
+            if exact:
+                self._connection.execute(
+                    f"DELETE FROM {self.table} WHERE path = ?",
+                    (path,),
+                )
+            else:
+                # The paths under the prefix sort between it and the prefix
+                # with its last separator incremented, so the index is used.
+                upper = path[:-1] + "\x20" if path else "\U0010ffff"
+                self._connection.execute(
+                    f"DELETE FROM {self.table} WHERE path >= ? AND path < ?",
+                    (path, upper),
+                )
+            self._log(CacheChange(CacheChangeType.invalidate, prefix, exact))
+
+    def _log(self, change: CacheChange) -> None:
+        self._connection.execute(
+            f"INSERT INTO {self.table}_changes "
+            "(source, type, key, exact, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                self.source,
+                change.type.value,
+                pickle.dumps(change.key),
+                int(change.exact),
+                time.time(),
+            ),
+        )
+
+    def poll(self) -> List[CacheChange]:
+        """Return the changes made by other processes since the last poll."""
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                f"SELECT id, source, type, key, exact FROM {self.table}_changes "
+                "WHERE id > ? ORDER BY id",
+                (self._last_change_id,),
+            ).fetchall()
+            now = time.time()
+            if now - self._pruned_at >= self.retention / 1000:
+                self._pruned_at = now
+                self._connection.execute(
+                    f"DELETE FROM {self.table}_changes WHERE created_at < ?",
+                    (now - self.retention / 1000,),
+                )
+
+        changes = []
+        for change_id, source, change_type, key, exact in rows:
+            self._last_change_id = change_id
+            if source != self.source:
+                changes.append(
+                    CacheChange(
+                        type=CacheChangeType(change_type),
+                        key=pickle.loads(key),
+                        exact=bool(exact),
+                    )
+                )
+        return changes
+
+    async def _poll(self) -> None:
+        self._poll_timer = None
+        for change in await self.run(self.poll):
+            self.notify_listeners(change)
+        if self.has_listeners():
+            self._schedule_poll()
+
+    def _schedule_poll(self) -> None:
+        if self._poll_timer is None:
+            self._poll_timer = self.scheduler.call_later(
+                self.poll_interval,
+                self._poll,
+            )
+
+    def on_subscribe(self) -> None:
+        self._schedule_poll()
+
+    def on_unsubscribe(self) -> None:
+        if not self.has_listeners() and self._poll_timer is not None:
+            self._poll_timer.cancel()
+            self._poll_timer = None
+
+    def close(self) -> None:
+        self.on_unsubscribe()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._connection.close()
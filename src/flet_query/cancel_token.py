@@ -0,0 +1,59 @@
+import asyncio
+import inspect
+from functools import partial
+from typing import Any, Callable, List
+
+
+class CancelToken:
+    """
+    Signals that a fetch was cancelled.
+
+    Fetchers that take a `cancel_token` keyword argument receive the token of
+    their fetch. Coroutine fetchers are cancelled with their task; the token
+    is for the work the task cannot interrupt, e.g. a synchronous fetcher
+    running on the executor, which can poll `is_cancelled` or register a
+    callback that closes its connection.
+    """
+
+    __slots__ = ("is_cancelled", "_callbacks")
+
+    def __init__(self) -> None:
+        self.is_cancelled = False
+        self._callbacks: List[Callable[[], Any]] = []
+
+    def cancel(self) -> None:
+        if self.is_cancelled:
+            return
+        self.is_cancelled = True
+        callbacks = self._callbacks
+        self._callbacks = []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback: Callable[[], Any]) -> Callable[[], None]:
+        """Call `callback` on cancellation; returns a function removing it."""
+        if self.is_cancelled:
+            callback()
+            return lambda: None
+        self._callbacks.append(callback)
+
+        def remove() -> None:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+        return remove
+
+    def raise_if_cancelled(self) -> None:
+        if self.is_cancelled:
+            raise asyncio.CancelledError()
+
+
+def bind_cancel_token(fn: Callable[..., Any], token: CancelToken) -> Callable[..., Any]:
+    """Pass `token` to `fn` if it takes a `cancel_token` argument."""
+    try:
+        parameters = inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return fn
+    if "cancel_token" not in parameters:
+        return fn
+    return partial(fn, cancel_token=token)
@@ -7,6 +7,8 @@ TListener = TypeVar("TListener", bound=Listener)
 
 
 class ChangeNotifier(Generic[TListener]):
+    __slots__ = ("listeners",)
+
     listeners: Set[TListener]
 
     def __init__(self) -> None:
@@ -0,0 +1,22 @@
+import time
+from datetime import datetime
+from typing import Optional
+
+# Offset from the monotonic clock to the Unix epoch, taken once so that
+# converting the same timestamp always gives the same datetime.
+_EPOCH_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+def now_ns() -> int:
+    """Return the monotonic time in nanoseconds used for query timestamps."""
+    return time.monotonic_ns()
+
+
+def to_datetime(timestamp: Optional[int]) -> Optional[datetime]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp((timestamp + _EPOCH_OFFSET_NS) / 1e9)
+
+
+def from_datetime(value: datetime) -> int:
+    return int(value.timestamp() * 1e9) - _EPOCH_OFFSET_NS
@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
+
+from .type import FetchPriority
+
+if TYPE_CHECKING:
+    from .query import QueryKey
+
+
+class FetchScheduler:
+    """
+    Admits fetch attempts under client-wide limits.
+
+    At most `max_concurrent` attempts run at once, and at most
+    `prefix_limits[prefix]` for keys under each limited prefix. Waiting
+    attempts start in priority order. After `failure_threshold` consecutive
+    failures under the same `breaker_depth`-long key prefix, its circuit opens
+    and retries under it are paused for `cooldown` milliseconds.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        prefix_limits: Optional[Dict["QueryKey", int]] = None,
+        failure_threshold: int = 5,
+        cooldown: int = 30000,
+        breaker_depth: int = 1,
+    ):
+        self.max_concurrent = max_concurrent
+        self.prefix_limits = prefix_limits or {}
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.breaker_depth = breaker_depth
+
+        self.active = 0
+        self.active_by_prefix: Dict["QueryKey", int] = {}
+        self._waiters: List[Tuple[int, int, "QueryKey", asyncio.Future]] = []
+        self._counter = 0
+        self._failures: Dict["QueryKey", int] = {}
+        self._open_until: Dict["QueryKey", float] = {}
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        query_key: "QueryKey",
+        priority: FetchPriority = FetchPriority.visible,
+    ) -> AsyncIterator[None]:
+        if not self._waiters and self._can_start(query_key):
+            self._start(query_key)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._counter += 1
+            heapq.heappush(self._waiters, (priority, self._counter, query_key, future))
+            # The waiters may all be blocked by prefix limits that do not
+            # apply to this key.
+            self._wake()
+            try:
+                await future
+            except asyncio.CancelledError:
+                # The slot may have been granted just before the cancellation.
+                if future.done() and not future.cancelled():
+                    self._finish(query_key)
+                raise
+
+        try:
+            yield
+        finally:
+            self._finish(query_key)
+
+    def _limited_prefixes(self, query_key: "QueryKey") -> List["QueryKey"]:
+        if not self.prefix_limits:
+            return []
+        return [
+            query_key[:length]
+            for length in range(len(query_key) + 1)
+            if query_key[:length] in self.prefix_limits
+        ]
+
+    def _can_start(self, query_key: "QueryKey") -> bool:
+        if self.max_concurrent is not None and self.active >= self.max_concurrent:
+            return False
+        return all(
+            self.active_by_prefix.get(prefix, 0) < self.prefix_limits[prefix]
+            for prefix in self._limited_prefixes(query_key)
+        )
+
+    def _start(self, query_key: "QueryKey") -> None:
+        self.active += 1
+        for prefix in self._limited_prefixes(query_key):
+            self.active_by_prefix[prefix] = self.active_by_prefix.get(prefix, 0) + 1
+
+    def _finish(self, query_key: "QueryKey") -> None:
+        self.active -= 1
+        for prefix in self._limited_prefixes(query_key):
+            self.active_by_prefix[prefix] -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        blocked = []
+        while self._waiters:
+            if self.max_concurrent is not None and self.active >= self.max_concurrent:
+                break
+            entry = heapq.heappop(self._waiters)
+            _, _, query_key, future = entry
+            if future.done():
+                continue
+            if self._can_start(query_key):
+                self._start(query_key)
+                future.set_result(None)
+            else:
+                # Blocked by a prefix limit; it must not hold back other keys.
+                blocked.append(entry)
+        for entry in blocked:
+            heapq.heappush(self._waiters, entry)
+
+    def _breaker_key(self, query_key: "QueryKey") -> "QueryKey":
+        return query_key[: self.breaker_depth]
+
+    def record_success(self, query_key: "QueryKey") -> None:
+        self._failures.pop(self._breaker_key(query_key), None)
+
+    def record_failure(self, query_key: "QueryKey") -> None:
+        breaker_key = self._breaker_key(query_key)
+        failures = self._failures.get(breaker_key, 0) + 1
+        if failures >= self.failure_threshold:
+            self._open_until[breaker_key] = time.monotonic() + self.cooldown / 1000
+            failures = 0
+        self._failures[breaker_key] = failures
+
+    def get_pause(self, query_key: "QueryKey") -> float:
+        """Return how long, in milliseconds, retries of the key are paused."""
+        open_until = self._open_until.get(self._breaker_key(query_key))
+        if open_until is None:
+            return 0
+        remaining = open_until - time.monotonic()
+        if remaining <= 0:
+            del self._open_until[self._breaker_key(query_key)]
+            return 0
+        return remaining * 1000
@@ -0,0 +1,52 @@
+import weakref
+from typing import Callable, Optional
+
+import flet as ft
+
+from .change_notifier import ChangeNotifier
+
+FocusListener = Callable[[bool], None]
+
+
+class FocusManager(ChangeNotifier[FocusListener]):
+    """
+    Tracks whether the app is visible, from the app lifecycle events of the
+    watched pages, each page on its own. Listeners receive the new value when
+    the app or one of the pages is shown or hidden.
+    """
+
+    __slots__ = ("is_focused", "_hidden_pages")
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Whether the whole app is visible; the pages are tracked apart.
+        self.is_focused = True
+        self._hidden_pages: "weakref.WeakSet[ft.Page]" = weakref.WeakSet()
+
+    def is_page_focused(self, page: Optional[ft.Page]) -> bool:
+        return self.is_focused and page not in self._hidden_pages
+
+    def set_focused(self, is_focused: bool, page: Optional[ft.Page] = None) -> None:
+        """Set whether `page`, or without a page the whole app, is visible."""
+        if page is None:
+            if is_focused == self.is_focused:
+                return
+            self.is_focused = is_focused
+        else:
+            if is_focused == (page not in self._hidden_pages):
+                return
+            if is_focused:
+                self._hidden_pages.discard(page)
+            else:
+                self._hidden_pages.add(page)
+        self.notify_listeners(is_focused)
+
+    def watch(self, page: ft.Page) -> None:
+        # Async handlers run on the event loop instead of a thread.
+        async def on_app_lifecycle_state_change(e: ft.AppLifecycleStateChangeEvent):
+            if e.state in (ft.AppLifecycleState.SHOW, ft.AppLifecycleState.RESUME):
+                self.set_focused(True, page)
+            elif e.state in (ft.AppLifecycleState.HIDE, ft.AppLifecycleState.PAUSE):
+                self.set_focused(False, page)
+
+        page.on_app_lifecycle_state_change.subscribe(on_app_lifecycle_state_change)
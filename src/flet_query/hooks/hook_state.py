@@ -0,0 +1,137 @@
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import flet as ft
+
+from ..observer import Observer
+from ..query import QueryKey
+
+STATE_ATTRIBUTE = "_flet_query_hook_state"
+
+# Replaces the `select` and `track_fields` of a hook result and syncs it,
+# returning whether a relevant field changed.
+ConfigureResult = Callable[[Optional[Callable[[Any], Any]], bool], bool]
+
+
+@dataclass
+class HookEntry:
+    observer: Observer
+    result: Any
+    configure: ConfigureResult
+
+
+class HookState:
+    """
+    The observers created by the hooks of one control.
+
+    They are kept across rebuilds of the control, subscribed when it mounts
+    and detached when it unmounts. Each hook call site of the control is one
+    slot, holding one observer at a time: give each item of a list its own
+    control rather than calling a hook in a loop.
+    """
+
+    __slots__ = ("control", "page", "entries", "is_mounted")
+
+    def __init__(self, control: ft.Control) -> None:
+        self.control = control
+        # The control may be detached from its page by the time it unmounts.
+        self.page = ft.context.page
+        self.entries: Dict[Hashable, HookEntry] = {}
+        self.is_mounted = control.page is not None
+
+    def reuse(
+        self,
+        key: Hashable,
+        query_key: QueryKey,
+        fetcher: Callable[..., Any],
+        options: Any,
+        select: Optional[Callable[[Any], Any]] = None,
+        track_fields: bool = False,
+    ) -> Any:
+        """
+        Update the observer and the result of the slot `key` in place and
+        return the result, or None if the slot is empty. An observer of
+        another query key moves to `query_key`, cancelling the fetch of the
+        previous key.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        observer = entry.observer
+        observer.fetcher = fetcher
+        if entry.configure(select, track_fields):
+            observer.client.notify_manager.schedule_update(self.page)
+        if observer.query_key == query_key:
+            self.page.run_task(observer.update_options, options)
+            return entry.result
+
+        async def move():
+            await observer.set_query_key(query_key)
+            await observer.update_options(options)
+
+        self.page.run_task(move)
+        return entry.result
+
+    def add(
+        self,
+        key: Hashable,
+        observer: Observer,
+        result: Any,
+        configure: ConfigureResult,
+    ) -> None:
+        self.entries[key] = HookEntry(
+            observer=observer,
+            result=result,
+            configure=configure,
+        )
+        if self.is_mounted:
+            self.page.run_task(observer.initialize)
+
+    def mount(self) -> None:
+        if self.is_mounted:
+            return
+        self.is_mounted = True
+        for entry in self.entries.values():
+            self.page.run_task(entry.observer.initialize)
+
+    def unmount(self) -> None:
+        if not self.is_mounted:
+            return
+        self.is_mounted = False
+        for entry in self.entries.values():
+            self.page.run_task(entry.observer.destroy)
+
+
+def get_hook_slot(hook: str) -> Hashable:
+    """Return the slot of the current `hook` call: the call site of the hook."""
+    frame = sys._getframe(2)
+    return (hook, frame.f_code, frame.f_lasti)
+
+
+def get_hook_state(control: ft.Control) -> HookState:
+    """
+    Return the hook state of `control`, wrapping its `did_mount` and
+    `will_unmount` on first use to follow its lifecycle.
+    """
+    state: Optional[HookState] = getattr(control, STATE_ATTRIBUTE, None)
+    if state is not None:
+        return state
+
+    state = HookState(control)
+    setattr(control, STATE_ATTRIBUTE, state)
+
+    did_mount: Callable[[], Any] = control.did_mount
+    will_unmount: Callable[[], Any] = control.will_unmount
+
+    def did_mount_with_hooks():
+        did_mount()
+        state.mount()
+
+    def will_unmount_with_hooks():
+        state.unmount()
+        will_unmount()
+
+    control.did_mount = did_mount_with_hooks  # type: ignore[method-assign]
+    control.will_unmount = will_unmount_with_hooks  # type: ignore[method-assign]
+    return state
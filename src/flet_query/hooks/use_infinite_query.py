@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import flet as ft
+
+from .hook_state import get_hook_slot, get_hook_state
+from .use_query import UseQueryOptions, UseQueryResult, create_result
+from .use_query_client import use_query_client
+from ..infinite_observer import InfiniteObserver
+from ..infinite_query import GetPageParam, PageFn
+from ..query import QueryKey, RefetchInterval
+from ..structural_sharing import StructuralSharing
+from ..type import FetchDirection, RefetchOnMount
+
+
+@dataclass
+class UseInfiniteQueryResult(UseQueryResult):
+    has_next_page: bool = False
+    has_previous_page: bool = False
+    fetch_next_page: Optional[Callable[[], Any]] = None
+    fetch_previous_page: Optional[Callable[[], Any]] = None
+
+
+@dataclass
+class UseInfiniteQueryOptions(UseQueryOptions):
+    initial_page_param: Any = None
+    get_next_page_param: Optional[GetPageParam] = None
+    get_previous_page_param: Optional[GetPageParam] = None
+    max_pages: Optional[int] = None
+
+
+def use_infinite_query(
+    query_key: QueryKey,
+    fetcher: PageFn,
+    get_next_page_param: GetPageParam,
+    initial_page_param: Any = None,
+    get_previous_page_param: Optional[GetPageParam] = None,
+    max_pages: Optional[int] = None,
+    enabled: bool = True,
+    refetch_on_mount: Optional[RefetchOnMount] = None,
+    stale_duration: Optional[int] = None,
+    cache_duration: Optional[int] = None,
+    refetch_interval: Optional[RefetchInterval] = None,
+    retry_count: int = 3,
+    retry_delay: int = 1500,
+    structural_sharing: StructuralSharing = True,
+    shared: bool = False,
+    refetch_backoff: float = 1,
+    max_refetch_interval: Optional[int] = None,
+    select: Optional[Callable[[Any], Any]] = None,
+    track_fields: bool = False,
+    control: Optional[ft.Control] = None,
+):
+    """
+    Subscribe to the paginated query at `query_key`.
+
+    `fetcher` receives a page param, starting with `initial_page_param`, and
+    returns a page. The data is an `InfiniteData` holding at most `max_pages`
+    pages; fetching past it drops the pages at the other end.
+
+    `get_next_page_param` and `get_previous_page_param` are called with the
+    last or first page, all the pages, that page's param and all the page
+    params, e.g. `lambda page, pages, param, params: param + 1`.
+
+    As with `use_query`, pass the calling `control` to keep its observer
+    across rebuilds.
+    """
+    options = UseInfiniteQueryOptions(
+        enabled=enabled,
+        refetch_on_mount=refetch_on_mount,
+        stale_duration=stale_duration,
+        cache_duration=cache_duration,
+        refetch_interval=refetch_interval,
+        retry_count=retry_count,
+        retry_delay=retry_delay,
+        structural_sharing=structural_sharing,
+        shared=shared,
+        refetch_backoff=refetch_backoff,
+        max_refetch_interval=max_refetch_interval,
+        initial_page_param=initial_page_param,
+        get_next_page_param=get_next_page_param,
+        get_previous_page_param=get_previous_page_param,
+        max_pages=max_pages,
+    )
+
+    client = use_query_client()
+    page = ft.context.page
+    client.watch_page(page)
+
+    hook_state = get_hook_state(control) if control is not None else None
+    hook_key = get_hook_slot("use_infinite_query")
+    if hook_state is not None:
+        result = hook_state.reuse(
+            hook_key,
+            query_key,
+            fetcher,
+            options,
+            select,
+            track_fields,
+        )
+        if result is not None:
+            return result
+
+    observer = InfiniteObserver(
+        query_key=query_key,
+        fetcher=fetcher,
+        client=client,
+        options=options,
+    )
+
+    result, sync_result, configure = create_result(
+        observer,
+        select,
+        track_fields,
+        result_class=UseInfiniteQueryResult,
+        get_extra_values=lambda: {
+            "has_next_page": observer.query.has_page(FetchDirection.forward),
+            "has_previous_page": observer.query.has_page(FetchDirection.backward),
+        },
+        fetch_next_page=observer.fetch_next_page,
+        fetch_previous_page=observer.fetch_previous_page,
+    )
+
+    def on_state_changed():
+        if sync_result():
+            client.notify_manager.schedule_update(page)
+
+    observer.subscribe(on_state_changed)
+
+    if hook_state is None:
+        page.run_task(observer.initialize)
+    else:
+        hook_state.add(hook_key, observer, result, configure)
+
+    return result
@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import Any, Callable, List, Mapping, Optional
+
+import flet as ft
+
+from .use_query_client import use_query_client
+from ..mutation import Mutation, MutationFn, MutationOptions
+from ..query import QueryKey
+from ..type import MutationStatus
+
+
+@dataclass
+class UseMutationResult:
+    data: Optional[Any]
+    error: Optional[Exception]
+    variables: Optional[Any]
+    is_idle: bool
+    is_pending: bool
+    is_success: bool
+    is_error: bool
+    status: MutationStatus
+    mutate: Callable[[Any], None]
+    mutate_async: Callable[[Any], Any]
+    reset: Callable[[], None]
+
+
+def use_mutation(
+    mutation_fn: MutationFn,
+    optimistic_update: Optional[
+        Callable[[Any], Mapping[QueryKey, Callable[[Any], Any]]]
+    ] = None,
+    on_mutate: Optional[Callable[[Any], Any]] = None,
+    on_success: Optional[Callable[[Any, Any, Any], Any]] = None,
+    on_error: Optional[Callable[[Exception, Any, Any], Any]] = None,
+    on_settled: Optional[Callable[[Any, Optional[Exception], Any, Any], Any]] = None,
+    update_queries: Optional[Callable[[Any, Any], Mapping[QueryKey, Any]]] = None,
+    invalidates: Optional[List[QueryKey]] = None,
+    scope: Optional[QueryKey] = None,
+    merge: Optional[Callable[[Any, Any], Any]] = None,
+):
+    client = use_query_client()
+    page = ft.context.page
+
+    mutation = Mutation(
+        client,
+        MutationOptions(
+            mutation_fn=mutation_fn,
+            optimistic_update=optimistic_update,
+            on_mutate=on_mutate,
+            on_success=on_success,
+            on_error=on_error,
+            on_settled=on_settled,
+            update_queries=update_queries,
+            invalidates=invalidates or [],
+            scope=scope,
+            merge=merge,
+        ),
+    )
+
+    async def mutate_silently(variables: Any):
+        try:
+            await mutation.mutate(variables)
+        except Exception:
+            # The error is exposed on the result.
+            pass
+
+    def mutate(variables: Any = None):
+        page.run_task(mutate_silently, variables)
+
+    result = UseMutationResult(
+        data=mutation.state.data,
+        error=mutation.state.error,
+        variables=mutation.state.variables,
+        is_idle=mutation.state.is_idle,
+        is_pending=mutation.state.is_pending,
+        is_success=mutation.state.is_success,
+        is_error=mutation.state.is_error,
+        status=mutation.state.status,
+        mutate=mutate,
+        mutate_async=mutation.mutate,
+        reset=mutation.reset,
+    )
+
+    def on_state_changed():
+        result.data = mutation.state.data
+        result.error = mutation.state.error
+        result.variables = mutation.state.variables
+        result.is_idle = mutation.state.is_idle
+        result.is_pending = mutation.state.is_pending
+        result.is_success = mutation.state.is_success
+        result.is_error = mutation.state.is_error
+        result.status = mutation.state.status
+        client.notify_manager.schedule_update(page)
+
+    mutation.subscribe(on_state_changed)
+
+    return result
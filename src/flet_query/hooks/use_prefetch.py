@@ -0,0 +1,35 @@
+from typing import Callable, Optional
+
+import flet as ft
+
+from .use_query_client import use_query_client
+from ..query import QueryFn, QueryKey
+
+
+def use_prefetch(
+    query_key: QueryKey,
+    fetcher: QueryFn,
+    stale_duration: Optional[int] = None,
+    shared: bool = False,
+) -> Callable[[Optional[ft.ControlEvent]], None]:
+    """
+    Return an event handler that prefetches the query, for the controls that
+    lead to the screen using it, e.g. `on_hover`, `on_focus` or `on_click`.
+
+    Hover events prefetch when the pointer enters only. Pass `shared` for a
+    query read with `shared=True`.
+    """
+    client = use_query_client().get_query_client(shared)
+    page = ft.context.page
+
+    def prefetch(e: Optional[ft.ControlEvent] = None):
+        if e is not None and e.name == "hover" and e.data == "false":
+            return
+        page.run_task(
+            client.prefetch_query,
+            query_key,
+            fetcher,
+            stale_duration,
+        )
+
+    return prefetch
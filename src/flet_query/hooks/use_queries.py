@@ -0,0 +1,108 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import flet as ft
+
+from .use_query import UseQueryOptions, UseQueryResult, create_result
+from .use_query_client import use_query_client
+from ..observer import Observer
+
+
+@dataclass
+class UseQueriesResult:
+    results: List[UseQueryResult]
+    data: List[Optional[Any]]
+    is_error: bool
+    is_loading: bool
+    is_fetching: bool
+    is_success: bool
+    refetch: Callable[[], Any]
+
+
+def use_queries(
+    queries: List[Dict[str, Any]],
+    concurrency: Optional[int] = None,
+) -> UseQueriesResult:
+    """
+    Subscribe to several queries at once.
+
+    Each item of `queries` holds the keyword arguments of `use_query`. At most
+    `concurrency` of the queries fetch at a time. The page is updated once
+    all of them have loaded, and after that once per tick in which any of
+    them changed.
+    """
+    client = use_query_client()
+    page = ft.context.page
+    client.watch_page(page)
+    limiter = asyncio.Semaphore(concurrency) if concurrency else None
+
+    observers: List[Observer] = []
+    results: List[UseQueryResult] = []
+    syncs: List[Callable[[], bool]] = []
+    for query in queries:
+        query = dict(query)
+        query_key = query.pop("query_key")
+        fetcher = query.pop("fetcher")
+        select = query.pop("select", None)
+        track_fields = query.pop("track_fields", False)
+        query.setdefault("enabled", True)
+
+        observer = Observer(
+            query_key=query_key,
+            fetcher=fetcher,
+            client=client,
+            options=UseQueryOptions(**query),
+            limiter=limiter,
+        )
+        result, sync_result, _ = create_result(observer, select, track_fields)
+        observers.append(observer)
+        results.append(result)
+        syncs.append(sync_result)
+
+    def refetch():
+        for observer in observers:
+            observer.fetch()
+
+    combined = UseQueriesResult(
+        results=results,
+        data=[],
+        is_error=False,
+        is_loading=False,
+        is_fetching=False,
+        is_success=False,
+        refetch=refetch,
+    )
+
+    def combine():
+        # Read through vars() so combining does not count as tracked reads.
+        values = [vars(result) for result in results]
+        combined.data = [value["data"] for value in values]
+        combined.is_error = any(value["is_error"] for value in values)
+        combined.is_loading = any(value["is_loading"] for value in values)
+        combined.is_fetching = any(value["is_fetching"] for value in values)
+        combined.is_success = all(value["is_success"] for value in values)
+
+    def is_initial_load() -> bool:
+        return any(
+            vars(result)["is_loading"] and observer.options.enabled
+            for observer, result in zip(observers, results)
+        )
+
+    combine()
+
+    for observer, sync_result in zip(observers, syncs):
+
+        def on_state_changed(sync_result=sync_result):
+            if not sync_result():
+                return
+            combine()
+            # Redraw once for the initial load rather than once per query.
+            if is_initial_load():
+                return
+            client.notify_manager.schedule_update(page)
+
+        observer.subscribe(on_state_changed)
+        page.run_task(observer.initialize)
+
+    return combined
@@ -1,12 +1,15 @@
-from dataclasses import dataclass, replace
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Awaitable, Callable, Optional, Any
+from typing import Any, Callable, Dict, Optional, Set, Tuple, Type, TypeVar
 
 import flet as ft
 
+from .hook_state import ConfigureResult, get_hook_slot, get_hook_state
 from .use_query_client import use_query_client
+from ..clock import to_datetime
 from ..observer import Observer
-from ..query import QueryKey
+from ..query import QueryKey, QueryState, RefetchInterval
+from ..structural_sharing import StructuralSharing, replace_equal_deep
 from ..type import QueryStatus, RefetchOnMount
 
 
@@ -22,6 +25,20 @@ class UseQueryResult:
     is_success: bool
     status: QueryStatus
     refetch: Callable[[], Any]
+    tracked_fields: Optional[Set[str]] = field(
+        default=None,
+        repr=False,
+        compare=False,
+    )
+
+    def __getattribute__(self, name: str) -> Any:
+        tracked_fields = object.__getattribute__(self, "tracked_fields")
+        if tracked_fields is not None and not name.startswith("_"):
+            tracked_fields.add(name)
+        return object.__getattribute__(self, name)
+
+
+TResult = TypeVar("TResult", bound=UseQueryResult)
 
 
 @dataclass
@@ -32,9 +49,107 @@ class UseQueryOptions:
     refetch_on_mount: Optional[RefetchOnMount] = None
     stale_duration: Optional[int] = None
     cache_duration: Optional[int] = None
-    refetch_interval: Optional[int] = None
+    refetch_interval: Optional[RefetchInterval] = None
     retry_count: int = 3
     retry_delay: int = 1500
+    structural_sharing: StructuralSharing = True
+    transform: Optional[Callable[[Any], Any]] = None
+    shared: bool = False
+    refetch_backoff: float = 1
+    max_refetch_interval: Optional[int] = None
+
+
+def create_result(
+    observer: Observer,
+    select: Optional[Callable[[Any], Any]] = None,
+    track_fields: bool = False,
+    result_class: Type[TResult] = UseQueryResult,
+    get_extra_values: Optional[Callable[[], Dict[str, Any]]] = None,
+    **actions: Callable[..., Any],
+) -> Tuple[TResult, Callable[[], bool], ConfigureResult]:
+    """
+    Create the result of `observer`, a function that brings it up to date
+    with the query state, returning whether a relevant field changed, and a
+    function that replaces `select` and `track_fields` and syncs the result,
+    e.g. when the control of a hook is rebuilt.
+
+    `result_class` may extend the result with more fields, filled from
+    `get_extra_values` and `actions`.
+    """
+    selected_from: Any = None
+    selected: Any = None
+
+    def select_data(data: Any) -> Any:
+        nonlocal selected_from, selected
+        if select is None or data is None:
+            return data
+        if data is not selected_from:
+            selected = replace_equal_deep(selected, select(data))
+            selected_from = data
+        return selected
+
+    def get_values(state: QueryState) -> Dict[str, Any]:
+        values = {
+            "data": select_data(state.data),
+            "data_updated_at": to_datetime(state.data_updated_at),
+            "error": state.error,
+            "error_updated_at": to_datetime(state.error_updated_at),
+            "is_error": state.is_error,
+            "is_loading": state.is_loading,
+            "is_fetching": state.is_fetching,
+            "is_success": state.is_success,
+            "status": state.status,
+        }
+        if get_extra_values is not None:
+            values.update(get_extra_values())
+        return values
+
+    result = result_class(
+        **get_values(observer.query.state),
+        refetch=observer.fetch,
+        tracked_fields=set() if track_fields else None,
+        **actions,
+    )
+
+    def sync_result() -> bool:
+        # Read through vars() so the comparison itself is not tracked.
+        current = vars(result)
+        changed_fields = set()
+        for name, value in get_values(observer.query.state).items():
+            if current[name] is value:
+                continue
+            # Data and errors are compared by identity: structural sharing
+            # and select memoization keep unchanged values identical.
+            if name not in ("data", "error") and current[name] == value:
+                continue
+            current[name] = value
+            changed_fields.add(name)
+
+        # The selected data is what the control shows; a new fetch time of
+        # source data that selects to the same value is not worth a redraw.
+        if select is not None and "data" not in changed_fields:
+            changed_fields.discard("data_updated_at")
+        if not changed_fields:
+            return False
+        if track_fields:
+            return not changed_fields.isdisjoint(current["tracked_fields"])
+        return True
+
+    def configure(
+        new_select: Optional[Callable[[Any], Any]],
+        new_track_fields: bool,
+    ) -> bool:
+        nonlocal select, track_fields, selected_from
+        if new_select is not select:
+            select = new_select
+            # Select the current data again; equal values keep their identity.
+            selected_from = None
+        if new_track_fields != track_fields:
+            track_fields = new_track_fields
+            vars(result)["tracked_fields"] = set() if track_fields else None
+        return sync_result()
+
+    return result, sync_result, configure
 
 
 def use_query(
@@ -44,10 +159,46 @@ def use_query(
     refetch_on_mount: Optional[RefetchOnMount] = None,
     stale_duration: Optional[int] = None,
     cache_duration: Optional[int] = None,
-    refetch_interval: Optional[int] = None,
+    refetch_interval: Optional[RefetchInterval] = None,
     retry_count: int = 3,
     retry_delay: int = 1500,
+    structural_sharing: StructuralSharing = True,
+    transform: Optional[Callable[[Any], Any]] = None,
+    shared: bool = False,
+    refetch_backoff: float = 1,
+    max_refetch_interval: Optional[int] = None,
+    select: Optional[Callable[[Any], Any]] = None,
+    track_fields: bool = False,
+    control: Optional[ft.Control] = None,
 ):
+    """
+    Subscribe to the query at `query_key`.
+
+    A synchronous `fetcher` runs on the client executor instead of the event
+    loop, as does `transform`, which post-processes each fetched result
+    before it is cached.
+
+    `select` transforms the data exposed on the result; it only runs when the
+    query data changes. With `track_fields`, the result records which fields
+    the control reads and the page is only updated when one of those fields
+    changes. Otherwise, it is updated when any field changes.
+
+    A `shared` query is fetched and cached once for the whole process, in the
+    shared client, and read by every session. Use it for public data only.
+
+    All the observers of a query share one poll loop, at the shortest
+    `refetch_interval` among them; it may be a function of the query state.
+    With a `refetch_backoff` above 1, the delay is multiplied by it after each
+    poll returning unchanged data, up to `max_refetch_interval`, and drops
+    back to `refetch_interval` when the data changes or on a refetch.
+
+    Pass the calling `control` to keep one observer per control and call
+    site: calling the hook again, e.g. when the control is rebuilt, updates
+    its options, `select` and `track_fields` in place and returns the same
+    result. With another key, the observer moves to it and the fetch of the
+    previous key is cancelled. The observer is attached when the control
+    mounts and detached when it unmounts.
+    """
     options = UseQueryOptions(
         enabled=enabled,
         refetch_on_mount=refetch_on_mount,
@@ -56,9 +207,30 @@ def use_query(
         refetch_interval=refetch_interval,
         retry_count=retry_count,
         retry_delay=retry_delay,
+        structural_sharing=structural_sharing,
+        transform=transform,
+        shared=shared,
+        refetch_backoff=refetch_backoff,
+        max_refetch_interval=max_refetch_interval,
     )
 
     client = use_query_client()
+    page = ft.context.page
+    client.watch_page(page)
+
+    hook_state = get_hook_state(control) if control is not None else None
+    hook_key = get_hook_slot("use_query")
+    if hook_state is not None:
+        result = hook_state.reuse(
+            hook_key,
+            query_key,
+            fetcher,
+            options,
+            select,
+            track_fields,
+        )
+        if result is not None:
+            return result
 
     observer = Observer(
         query_key=query_key,
@@ -67,33 +239,17 @@ def use_query(
         options=options,
     )
 
-    result = UseQueryResult(
-        data=observer.query.state.data,
-        data_updated_at=observer.query.state.data_updated_at,
-        error=observer.query.state.error,
-        error_updated_at=observer.query.state.error_updated_at,
-        is_error=observer.query.state.is_error,
-        is_loading=observer.query.state.is_loading,
-        is_fetching=observer.query.state.is_fetching,
-        is_success=observer.query.state.is_success,
-        status=observer.query.state.status,
-        refetch=observer.fetch,
-    )
+    result, sync_result, configure = create_result(observer, select, track_fields)
 
     def on_state_changed():
-        result.data = observer.query.state.data
-        result.data_updated_at = observer.query.state.data_updated_at
-        result.error = observer.query.state.error
-        result.error_updated_at = observer.query.state.error_updated_at
-        result.is_error = observer.query.state.is_error
-        result.is_loading = observer.query.state.is_loading
-        result.is_fetching = observer.query.state.is_fetching
-        result.is_success = observer.query.state.is_success
-        result.status = observer.query.state.status
-        ft.context.page.update()
+        if sync_result():
+            client.notify_manager.schedule_update(page)
 
     observer.subscribe(on_state_changed)
 
-    ft.context.page.run_task(observer.initialize)
+    if hook_state is None:
+        page.run_task(observer.initialize)
+    else:
+        hook_state.add(hook_key, observer, result, configure)
 
     return result
@@ -1,13 +1,77 @@
+from typing import Callable, Optional
+
+import flet as ft
+
 from ..query_client import QueryClient
 
+SESSION_KEY = "flet_query.client"
+
+# The process-wide store of the queries marked `shared=True`. Its executor
+# runs the synchronous fetchers of every session, so closed sessions do not
+# leave idle threads behind.
+_shared_query_client = QueryClient()
+_query_client: Optional[QueryClient] = None
+_default_query_client = QueryClient(
+    shared_client=_shared_query_client,
+    executor=_shared_query_client.executor,
+)
+
+
+def _create_query_client() -> QueryClient:
+    return QueryClient(
+        shared_client=_shared_query_client,
+        executor=_shared_query_client.executor,
+    )
+
+
+_query_client_factory: Callable[[], QueryClient] = _create_query_client
 
-_query_client = QueryClient()
 
+def use_query_client() -> QueryClient:
+    """
+    Return the query client of the current session.
 
-def use_query_client():
-    return _query_client
+    Each page gets its own client, created by the query client factory on
+    first use, so sessions of a web app do not see each other's queries.
+    Queries marked `shared=True` live in one process-wide client instead.
+    """
+    if _query_client is not None:
+        return _query_client
 
+    page = ft.context.page
+    if page is None:
+        return _default_query_client
 
-def set_query_client(client: QueryClient):
+    client = page.session.get(SESSION_KEY)
+    if client is None:
+        client = _query_client_factory()
+        page.session.set(SESSION_KEY, client)
+    return client
+
+
+def set_query_client(client: Optional[QueryClient], page: Optional[ft.Page] = None):
+    """
+    Set the client of `page`, or, without a page, one client used by every
+    session instead of the per-session clients. Pass None to go back to
+    per-session clients.
+    """
     global _query_client
-    _query_client = client
+    if page is not None:
+        page.session.set(SESSION_KEY, client)
+    else:
+        _query_client = client
+
+
+def set_query_client_factory(factory: Callable[[], QueryClient]):
+    """
+    Set how the per-session clients are created, e.g. with default options.
+    Pass `shared_client=get_shared_query_client()` to keep shared queries, and
+    an executor shared by all the clients, e.g. its `executor`; a client
+    creating its own keeps its threads after the session ends.
+    """
+    global _query_client_factory
+    _query_client_factory = factory
+
+
+def get_shared_query_client() -> QueryClient:
+    return _shared_query_client
@@ -0,0 +1,44 @@
+from typing import TYPE_CHECKING
+
+from .infinite_query import InfiniteData, InfiniteQuery
+from .observer import Observer
+from .type import FetchDirection, TError
+
+if TYPE_CHECKING:
+    from .hooks.use_infinite_query import UseInfiniteQueryOptions
+
+
+class InfiniteObserver(Observer[InfiniteData, TError]):
+    __slots__ = ("infinite_options",)
+
+    query_class = InfiniteQuery
+    query: InfiniteQuery[TError]
+    infinite_options: "UseInfiniteQueryOptions"
+
+    def set_options(
+        self,
+        options: "UseInfiniteQueryOptions",
+    ):
+        super().set_options(options)
+        self.infinite_options = options
+
+    def set_query_options(self):
+        super().set_query_options()
+        self.query.initial_page_param = self.infinite_options.initial_page_param
+        self.query.get_next_page_param = self.infinite_options.get_next_page_param
+        self.query.get_previous_page_param = (
+            self.infinite_options.get_previous_page_param
+        )
+        self.query.max_pages = self.infinite_options.max_pages
+
+    def fetch_next_page(self):
+        self.run_task(self.fetch_page_async, FetchDirection.forward)
+
+    def fetch_previous_page(self):
+        self.run_task(self.fetch_page_async, FetchDirection.backward)
+
+    async def fetch_page_async(self, direction: FetchDirection):
+        if not self.options.enabled:
+            return
+
+        await self.query.fetch(self.fetcher, direction=direction)
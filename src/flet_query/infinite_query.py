@@ -0,0 +1,145 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generic, List, Optional
+
+from .cancel_token import CancelToken, bind_cancel_token
+from .query import Query
+from .type import FetchDirection, FetchPriority, TData, TError
+
+PageFn = Callable[[Any], TData]
+# (page, pages, page_param, page_params) -> the param of the adjacent page,
+# where page is the last page for the next param and the first one for the
+# previous param, so params can be derived even once pages were dropped.
+GetPageParam = Callable[[TData, List[TData], Any, List[Any]], Optional[Any]]
+
+
+@dataclass
+class InfiniteData(Generic[TData]):
+    pages: List[TData] = field(default_factory=list)
+    page_params: List[Any] = field(default_factory=list)
+
+
+class InfiniteQuery(Query[InfiniteData, TError]):
+    """
+    A query whose data is a window of pages.
+
+    The fetcher receives a page param. Pages are added one at a time with
+    `FetchDirection.forward`/`FetchDirection.backward`; past `max_pages`, the
+    pages at the other end of the window are dropped. A plain fetch, e.g. on
+    invalidation, refetches only the pages in the window.
+    """
+
+    __slots__ = (
+        "initial_page_param",
+        "get_next_page_param",
+        "get_previous_page_param",
+        "max_pages",
+        "fetch_direction",
+    )
+
+    initial_page_param: Any
+    get_next_page_param: Optional[GetPageParam]
+    get_previous_page_param: Optional[GetPageParam]
+    max_pages: Optional[int]
+    # The direction of the running fetch, None for a refetch of the window.
+    fetch_direction: Optional[FetchDirection]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.initial_page_param = None
+        self.get_next_page_param = None
+        self.get_previous_page_param = None
+        self.max_pages = None
+        self.fetch_direction = None
+
+    async def fetch(
+        self,
+        fetcher: PageFn,
+        silent: bool = False,
+        priority: FetchPriority = FetchPriority.visible,
+        direction: Optional[FetchDirection] = None,
+    ) -> Optional[InfiniteData]:
+        """
+        Fetch pages. A page request waits for a running fetch in another
+        direction, e.g. a poll refetching the window, instead of sharing it
+        and losing its direction; it shares a running request for the same
+        direction.
+        """
+        while direction is not None:
+            task = self.fetch_task
+            if task is None or task.done() or self.fetch_direction == direction:
+                break
+            await asyncio.wait([task])
+
+        async def fetch_pages(cancel_token: CancelToken):
+            page_fetcher = bind_cancel_token(fetcher, cancel_token)
+            return await self._fetch_pages(page_fetcher, direction)
+
+        if self.fetch_task is None or self.fetch_task.done():
+            self.fetch_direction = direction
+        return await super().fetch(fetch_pages, silent, priority)
+
+    def get_page_param(self, direction: FetchDirection) -> Optional[Any]:
+        data = self.state.data
+        if data is None or not data.pages:
+            return None
+        if direction == FetchDirection.forward:
+            if self.get_next_page_param is None:
+                return None
+            return self.get_next_page_param(
+                data.pages[-1],
+                data.pages,
+                data.page_params[-1],
+                data.page_params,
+            )
+        if self.get_previous_page_param is None:
+            return None
+        return self.get_previous_page_param(
+            data.pages[0],
+            data.pages,
+            data.page_params[0],
+            data.page_params,
+        )
+
+    def has_page(self, direction: FetchDirection) -> bool:
+        return self.get_page_param(direction) is not None
+
+    async def _fetch_pages(
+        self,
+        fetcher: PageFn,
+        direction: Optional[FetchDirection],
+    ) -> InfiniteData:
+        data = self.state.data
+
+        if data is None or not data.pages:
+            page = await self.client.call_fetcher(fetcher, self.initial_page_param)
+            return InfiniteData(pages=[page], page_params=[self.initial_page_param])
+
+        if direction is None:
+            pages = await asyncio.gather(
+                *(
+                    self.client.call_fetcher(fetcher, page_param)
+                    for page_param in data.page_params
+                )
+            )
+            return InfiniteData(pages=list(pages), page_params=list(data.page_params))
+
+        page_param = self.get_page_param(direction)
+        if page_param is None:
+            return data
+
+        page = await self.client.call_fetcher(fetcher, page_param)
+        if direction == FetchDirection.forward:
+            pages = [*data.pages, page]
+            page_params = [*data.page_params, page_param]
+            if self.max_pages and len(pages) > self.max_pages:
+                pages = pages[-self.max_pages :]
+                page_params = page_params[-self.max_pages :]
+        else:
+            pages = [page, *data.pages]
+            page_params = [page_param, *data.page_params]
+            if self.max_pages and len(pages) > self.max_pages:
+                pages = pages[: self.max_pages]
+                page_params = page_params[: self.max_pages]
+
+        return InfiniteData(pages=pages, page_params=page_params)
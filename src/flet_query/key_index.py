@@ -0,0 +1,110 @@
+from typing import Any, Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+TValue = TypeVar("TValue")
+
+KeyPrefix = Tuple[Any, ...]
+
+_MISSING: Any = object()
+
+
+class KeyIndexNode(Generic[TValue]):
+    __slots__ = ("children", "value")
+
+    def __init__(self) -> None:
+        # Created with the first child; most nodes are leaves.
+        self.children: Optional[Dict[Any, "KeyIndexNode[TValue]"]] = None
+        self.value: TValue = _MISSING
+
+
+class KeyIndex(Generic[TValue]):
+    """
+    A trie over the segments of tuple keys.
+
+    Lookups by prefix only visit the nodes below the prefix, so their cost
+    is proportional to the number of matched keys instead of the total number
+    of indexed keys.
+    """
+
+    def __init__(self) -> None:
+        self.root: KeyIndexNode[TValue] = KeyIndexNode()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _find_node(self, prefix: KeyPrefix) -> Optional[KeyIndexNode[TValue]]:
+        node = self.root
+        for segment in prefix:
+            if node.children is None:
+                return None
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node
+
+    def get(self, key: KeyPrefix) -> Optional[TValue]:
+        node = self._find_node(key)
+        if node is None or node.value is _MISSING:
+            return None
+        return node.value
+
+    def set(self, key: KeyPrefix, value: TValue) -> None:
+        node = self.root
+        for segment in key:
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = KeyIndexNode()
+            node = child
+        if node.value is _MISSING:
+            self.size += 1
+        node.value = value
+
+    def delete(self, key: KeyPrefix) -> Optional[TValue]:
+        path: List[Tuple[KeyIndexNode[TValue], Any]] = []
+        node = self.root
+        for segment in key:
+            child = node.children.get(segment) if node.children else None
+            if child is None:
+                return None
+            path.append((node, segment))
+            node = child
+
+        if node.value is _MISSING:
+            return None
+        value = node.value
+        node.value = _MISSING
+        self.size -= 1
+
+        # Prune the branches that no longer lead to any value.
+        for parent, segment in reversed(path):
+            child = parent.children[segment]
+            if child.children or child.value is not _MISSING:
+                break
+            del parent.children[segment]
+            if not parent.children:
+                parent.children = None
+
+        return value
+
+    def find(self, prefix: KeyPrefix, exact: bool = False) -> List[TValue]:
+        node = self._find_node(prefix)
+        if node is None:
+            return []
+        if exact:
+            return [] if node.value is _MISSING else [node.value]
+        return list(self._values(node))
+
+    def _values(self, node: KeyIndexNode[TValue]) -> Iterator[TValue]:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.value is not _MISSING:
+                yield node.value
+            if node.children:
+                stack.extend(node.children.values())
+
+    def clear(self) -> None:
+        self.root = KeyIndexNode()
+        self.size = 0
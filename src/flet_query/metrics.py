@@ -0,0 +1,153 @@
+import bisect
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Sequence, Tuple
+
+from .change_notifier import ChangeNotifier
+from .type import MountOutcome
+
+if TYPE_CHECKING:
+    from .query import QueryKey
+
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass
+class Histogram:
+    """`counts[i]` counts the values in `(buckets[i - 1], buckets[i]]`."""
+
+    buckets: Sequence[float]
+    counts: List[int] = field(default_factory=list)
+    count: int = 0
+    sum: float = 0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            # The last count holds the values above every bucket.
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+@dataclass
+class PrefixMetrics:
+    fetch_latency: Histogram
+    fetches: int = 0
+    retries: int = 0
+    errors: int = 0
+    mount_hits: int = 0
+    mount_stale_hits: int = 0
+    mount_misses: int = 0
+    observers: int = 0
+    notifications: int = 0
+    notified_observers: int = 0
+
+
+@dataclass
+class MetricEvent:
+    name: str
+    query_key: "QueryKey"
+    value: Any = None
+
+
+MetricListener = Callable[[MetricEvent], None]
+
+
+class QueryMetrics(ChangeNotifier[MetricListener]):
+    """
+    Collects query metrics per key prefix of `prefix_depth` segments.
+
+    Read them with `snapshot()`, or subscribe a listener to receive a
+    `MetricEvent` per recorded value, e.g. to export them to Prometheus or
+    OpenTelemetry. A client without metrics records nothing. Latencies are in
+    milliseconds.
+    """
+
+    def __init__(
+        self,
+        prefix_depth: int = 1,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__()
+        self.prefix_depth = prefix_depth
+        self.buckets = buckets
+        self.prefixes: Dict["QueryKey", PrefixMetrics] = {}
+
+    def _get(self, query_key: "QueryKey") -> PrefixMetrics:
+        prefix = query_key[: self.prefix_depth]
+        metrics = self.prefixes.get(prefix)
+        if metrics is None:
+            metrics = self.prefixes[prefix] = PrefixMetrics(
+                fetch_latency=Histogram(self.buckets)
+            )
+        return metrics
+
+    def _emit(self, name: str, query_key: "QueryKey", value: Any = None) -> None:
+        if self.listeners:
+            self.notify_listeners(MetricEvent(name, query_key, value))
+
+    def record_fetch(
+        self,
+        query_key: "QueryKey",
+        latency: float,
+        attempts: int,
+        is_error: bool,
+    ) -> None:
+        metrics = self._get(query_key)
+        metrics.fetches += 1
+        metrics.retries += max(0, attempts - 1)
+        metrics.fetch_latency.observe(latency)
+        if is_error:
+            metrics.errors += 1
+        self._emit("fetch", query_key, latency)
+        if attempts > 1:
+            self._emit("retry", query_key, attempts - 1)
+        if is_error:
+            self._emit("error", query_key)
+
+    def record_mount(self, query_key: "QueryKey", outcome: MountOutcome) -> None:
+        metrics = self._get(query_key)
+        if outcome == MountOutcome.hit:
+            metrics.mount_hits += 1
+        elif outcome == MountOutcome.stale_hit:
+            metrics.mount_stale_hits += 1
+        else:
+            metrics.mount_misses += 1
+        self._emit("mount", query_key, outcome)
+
+    def record_observers(self, query_key: "QueryKey", delta: int) -> None:
+        self._get(query_key).observers += delta
+        self._emit("observers", query_key, delta)
+
+    def record_notification(self, query_key: "QueryKey", fan_out: int) -> None:
+        metrics = self._get(query_key)
+        metrics.notifications += 1
+        metrics.notified_observers += fan_out
+        self._emit("notification", query_key, fan_out)
+
+    def snapshot(self) -> Dict[Tuple[Any, ...], Dict[str, Any]]:
+        return {
+            prefix: {
+                "fetches": metrics.fetches,
+                "retries": metrics.retries,
+                "errors": metrics.errors,
+                "fetch_latency": {
+                    "buckets": list(metrics.fetch_latency.buckets),
+                    "counts": list(metrics.fetch_latency.counts),
+                    "count": metrics.fetch_latency.count,
+                    "sum": metrics.fetch_latency.sum,
+                },
+                "mount_hits": metrics.mount_hits,
+                "mount_stale_hits": metrics.mount_stale_hits,
+                "mount_misses": metrics.mount_misses,
+                "observers": metrics.observers,
+                "notifications": metrics.notifications,
+                "notified_observers": metrics.notified_observers,
+            }
+            for prefix, metrics in self.prefixes.items()
+        }
+
+    def reset(self) -> None:
+        self.prefixes = {}
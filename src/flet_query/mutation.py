@@ -0,0 +1,183 @@
+import inspect
+from dataclasses import dataclass, field, replace
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Mapping,
+    Optional,
+    TypeVar,
+)
+
+from .change_notifier import ChangeNotifier
+from .type import MutationStatus, TData, TError
+
+if TYPE_CHECKING:
+    from .query import QueryKey, QueryState
+    from .query_client import QueryClient
+
+TVariables = TypeVar("TVariables")
+
+MutationFn = Callable[[TVariables], Awaitable[TData]]
+
+
+async def maybe_await(value: Any) -> Any:
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+@dataclass
+class MutationOptions(Generic[TData, TVariables]):
+    """
+    `optimistic_update` returns, for the given variables, an updater per
+    query key. The updaters are applied before `mutation_fn` runs and are
+    rolled back if it fails. On success, `update_queries` returns data to
+    write to query keys and `invalidates` lists the key prefixes to
+    invalidate.
+
+    Mutations sharing a `scope` run one after another. With `merge`, a
+    mutation queued behind another of the same scope is merged into it
+    instead of running separately.
+    """
+
+    mutation_fn: MutationFn
+    optimistic_update: Optional[
+        Callable[[TVariables], Mapping["QueryKey", Callable[[Any], Any]]]
+    ] = None
+    on_mutate: Optional[Callable[[TVariables], Any]] = None
+    on_success: Optional[Callable[[TData, TVariables, Any], Any]] = None
+    on_error: Optional[Callable[[Exception, TVariables, Any], Any]] = None
+    on_settled: Optional[
+        Callable[[Optional[TData], Optional[Exception], TVariables, Any], Any]
+    ] = None
+    update_queries: Optional[
+        Callable[[TData, TVariables], Mapping["QueryKey", Any]]
+    ] = None
+    invalidates: List["QueryKey"] = field(default_factory=list)
+    scope: Optional["QueryKey"] = None
+    merge: Optional[Callable[[TVariables, TVariables], TVariables]] = None
+
+
+@dataclass
+class MutationState(Generic[TData, TError, TVariables]):
+    data: Optional[TData] = None
+    error: Optional[TError] = None
+    variables: Optional[TVariables] = None
+    status: MutationStatus = MutationStatus.idle
+
+    @property
+    def is_idle(self) -> bool:
+        return self.status == MutationStatus.idle
+
+    @property
+    def is_pending(self) -> bool:
+        return self.status == MutationStatus.pending
+
+    @property
+    def is_success(self) -> bool:
+        return self.status == MutationStatus.success
+
+    @property
+    def is_error(self) -> bool:
+        return self.status == MutationStatus.error
+
+
+MutationListener = Callable[[], None]
+
+
+class Mutation(ChangeNotifier[MutationListener], Generic[TData, TError, TVariables]):
+    client: "QueryClient"
+    options: MutationOptions[TData, TVariables]
+    state: MutationState[TData, TError, TVariables]
+
+    def __init__(
+        self,
+        client: "QueryClient",
+        options: MutationOptions[TData, TVariables],
+    ):
+        super().__init__()
+        self.client = client
+        self.options = options
+        self.state = MutationState()
+
+    async def mutate(self, variables: TVariables) -> TData:
+        """Run the mutation, queued behind others of the same scope."""
+        return await self.client.mutation_cache.run(self, variables)
+
+    def reset(self):
+        self._set_state(MutationState())
+
+    def _set_state(self, state: MutationState[TData, TError, TVariables]):
+        self.state = state
+        self.client.notify_manager.schedule(self.notify_listeners)
+
+    async def execute(self, variables: TVariables) -> TData:
+        self._set_state(
+            MutationState(status=MutationStatus.pending, variables=variables)
+        )
+
+        snapshots: Dict["QueryKey", "QueryState"] = {}
+        context = None
+        try:
+            if self.options.optimistic_update:
+                await self._apply_optimistic_update(variables, snapshots)
+            if self.options.on_mutate:
+                context = await maybe_await(self.options.on_mutate(variables))
+            data = await self.options.mutation_fn(variables)
+        except Exception as error:
+            self._rollback(snapshots)
+            if self.options.on_error:
+                await maybe_await(self.options.on_error(error, variables, context))
+            if self.options.on_settled:
+                await maybe_await(
+                    self.options.on_settled(None, error, variables, context)
+                )
+            self._set_state(
+                replace(self.state, error=error, status=MutationStatus.error)
+            )
+            raise
+
+        with self.client.batch():
+            if self.options.update_queries:
+                updates = self.options.update_queries(data, variables)
+                await self.client.set_queries_data(updates)
+            for prefix in self.options.invalidates:
+                await self.client.invalidate_queries(prefix)
+
+        if self.options.on_success:
+            await maybe_await(self.options.on_success(data, variables, context))
+        if self.options.on_settled:
+            await maybe_await(self.options.on_settled(data, None, variables, context))
+        self._set_state(
+            replace(self.state, data=data, status=MutationStatus.success)
+        )
+        return data
+
+    async def _apply_optimistic_update(
+        self,
+        variables: TVariables,
+        snapshots: Dict["QueryKey", "QueryState"],
+    ):
+        assert self.options.optimistic_update
+        updaters = self.options.optimistic_update(variables)
+        with self.client.batch():
+            for query_key, updater in updaters.items():
+                query = self.client.query_cache.get(query_key)
+                if query is None:
+                    continue
+                # A fetch finishing later would overwrite the optimistic data.
+                await query.cancel()
+                snapshots[query_key] = query.state.copy()
+                await self.client.set_query_data(query_key, updater)
+
+    def _rollback(self, snapshots: Dict["QueryKey", "QueryState"]):
+        with self.client.batch():
+            for query_key, state in snapshots.items():
+                query = self.client.query_cache.queries.get(query_key)
+                if query is not None:
+                    query.set_state(state)
@@ -0,0 +1,57 @@
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:
+    from .mutation import Mutation
+    from .query import QueryKey
+
+
+@dataclass
+class QueuedMutation:
+    mutation: "Mutation"
+    variables: Any
+    future: asyncio.Future
+
+
+class MutationCache:
+    """Runs mutations, one at a time for each scope."""
+
+    queues: Dict["QueryKey", List[QueuedMutation]]
+
+    def __init__(self) -> None:
+        self.queues = {}
+
+    async def run(self, mutation: "Mutation", variables: Any) -> Any:
+        scope = mutation.options.scope
+        if scope is None:
+            return await mutation.execute(variables)
+
+        queue = self.queues.setdefault(scope, [])
+
+        # The head of the queue is running; only later entries can be merged.
+        last = queue[-1] if len(queue) > 1 else None
+        if last and last.mutation is mutation and mutation.options.merge:
+            last.variables = mutation.options.merge(last.variables, variables)
+            return await asyncio.shield(last.future)
+
+        entry = QueuedMutation(
+            mutation=mutation,
+            variables=variables,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        queue.append(entry)
+        if len(queue) == 1:
+            asyncio.ensure_future(self._drain(scope))
+        return await asyncio.shield(entry.future)
+
+    async def _drain(self, scope: "QueryKey") -> None:
+        queue = self.queues[scope]
+        while queue:
+            entry = queue[0]
+            try:
+                entry.future.set_result(await entry.mutation.execute(entry.variables))
+            except Exception as error:
+                entry.future.set_exception(error)
+            queue.pop(0)
+        del self.queues[scope]
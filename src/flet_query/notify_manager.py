@@ -0,0 +1,92 @@
+import asyncio
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Optional, Union
+
+from .scheduler import Scheduler, TimerHandle, default_scheduler
+
+if TYPE_CHECKING:
+    import flet as ft
+
+NotifyCallback = Callable[[], None]
+
+
+class NotifyManager:
+    """
+    Coalesces observer notifications and page updates.
+
+    Scheduled callbacks are collected until the end of the current event loop
+    tick (or until `window` milliseconds have passed) and then run once each,
+    followed by a single `page.update()` per page they marked dirty. Inside
+    `batch()` nothing is flushed until the outermost batch exits.
+    """
+
+    def __init__(
+        self,
+        window: int = 0,
+        scheduler: Optional[Scheduler] = None,
+    ):
+        self.window = window
+        self.scheduler = scheduler if scheduler is not None else default_scheduler
+        self._queue: Dict[NotifyCallback, None] = {}
+        self._pages: Dict["ft.Page", None] = {}
+        self._depth = 0
+        self._is_flushing = False
+        self._flush_handle: Optional[Union[asyncio.Handle, TimerHandle]] = None
+
+    def schedule(self, callback: NotifyCallback) -> None:
+        self._queue[callback] = None
+        self._schedule_flush()
+
+    def schedule_update(self, page: "ft.Page") -> None:
+        self._pages[page] = None
+        self._schedule_flush()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._depth > 0 or self._is_flushing or self._flush_handle is not None:
+            return
+
+        if self.window > 0:
+            self._flush_handle = self.scheduler.call_later(self.window, self.flush)
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self._flush_handle = loop.call_soon(self.flush)
+
+    def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if self._depth > 0 or self._is_flushing:
+            return
+
+        # Callbacks that schedule more work while flushing are picked up by
+        # this flush instead of scheduling another one.
+        self._is_flushing = True
+        try:
+            while self._queue:
+                queue = self._queue
+                self._queue = {}
+                for callback in queue:
+                    callback()
+
+            pages = self._pages
+            self._pages = {}
+            for page in pages:
+                page.update()
+        finally:
+            self._is_flushing = False
@@ -1,30 +1,39 @@
-from datetime import datetime, timedelta
-from threading import Timer
-from typing import TYPE_CHECKING, Callable, Generic, Optional
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Generic, Optional, Type
 
 import flet as ft
 
 from .change_notifier import ChangeNotifier
-from .retry_resolver import RetryResolver
-from .query import Query, QueryKey, QueryOptions
-from .type import DispatchAction, RefetchOnMount, TData, TError
+from .query import Query, QueryFn, QueryKey, QueryOptions
+from .type import FetchPriority, MountOutcome, RefetchOnMount, TData, TError
 
 if TYPE_CHECKING:
     from .query_client import QueryClient
     from .hooks.use_query import UseQueryOptions
 
-QueryFn = Callable[[], TData]
-
 
 class Observer(ChangeNotifier, Generic[TData, TError]):
+    __slots__ = (
+        "query_key",
+        "client",
+        "fetcher",
+        "query",
+        "options",
+        "limiter",
+        "page",
+        "__weakref__",
+    )
+
+    query_class: Type[Query] = Query
     query_key: QueryKey
     client: "QueryClient"
     fetcher: QueryFn
     query: Query[TData, TError]
 
     options: QueryOptions[TData, TError]
-    resolver: RetryResolver = RetryResolver()
-    refetch_timer: Optional[Timer] = None
+    limiter: Optional[asyncio.Semaphore]
+    # The page the observer was created on, which runs its fetches.
+    page: Optional[ft.Page]
 
     def __init__(
         self,
@@ -32,26 +41,43 @@ class Observer(ChangeNotifier, Generic[TData, TError]):
         fetcher: QueryFn,
         client: "QueryClient",
         options: "UseQueryOptions",
+        limiter: Optional[asyncio.Semaphore] = None,
     ):
         super().__init__()
 
         self.query_key = query_key
         self.fetcher = fetcher
         self.client = client
+        self.limiter = limiter
+        self.page = ft.context.page
 
-        self.query = client.query_cache.build(
-            query_key=query_key,
-            query_client=client,
-        )
         self.set_options(options)
+        self.query = self._get_query()
         self.query.set_cache_duration(self.options.cache_duration)
+        self.set_query_options()
+
+    def _get_query(self) -> Query[TData, TError]:
+        # A shared query lives in the process-wide client, so every session
+        # reads the same copy; the observer still notifies through `client`.
+        query_client = self.client.get_query_client(self.options.shared)
+        query = query_client.query_cache.get(self.query_key)
+        if query is None:
+            query = query_client.query_cache.build(
+                query_key=self.query_key,
+                query_client=query_client,
+                query_class=self.query_class,
+            )
+        query.hold(self)
+        return query
 
     async def update_options(
         self,
         options: "UseQueryOptions",
     ):
-        refetch_interval_changed = (
+        polling_changed = (
             self.options.refetch_interval != options.refetch_interval
+            or self.options.refetch_backoff != options.refetch_backoff
+            or self.options.max_refetch_interval != options.max_refetch_interval
         )
         is_enabled_changed = self.options.enabled != options.enabled
 
@@ -61,69 +87,120 @@ class Observer(ChangeNotifier, Generic[TData, TError]):
             if options.enabled:
                 self.fetch()
             else:
-                await self.resolver.cancel()
-                if self.refetch_timer:
-                    self.refetch_timer.cancel()
+                await self.cancel_fetch()
 
         if options.cache_duration is not None:
             self.query.set_cache_duration(options.cache_duration)
 
-        if refetch_interval_changed:
-            if options.refetch_interval is not None:
-                self.schedule_refetch()
-            else:
-                if self.refetch_timer:
-                    self.refetch_timer.cancel()
-                    self.refetch_timer = None
+        self.set_query_options()
+
+        if polling_changed or is_enabled_changed:
+            self.query.schedule_poll()
 
     def fetch(self):
-        ft.context.page.run_task(self.fetch_async)
+        self.run_task(self.fetch_async)
+
+    def run_task(self, handler: Callable[..., Awaitable[Any]], *args: Any):
+        """
+        Run `handler` on the page of the observer, or as a task of the client
+        for an observer created outside of a session. Notifications may come
+        from timers or other sessions, where there is no current page.
+        """
+        if self.page is not None:
+            self.page.run_task(handler, *args)
+        else:
+            self.client.run_task(handler, *args)
 
     async def fetch_async(self):
-        if not self.options.enabled or self.query.state.is_fetching:
+        if not self.options.enabled:
             return
 
-        await self.query.dispatch(DispatchAction.fetch, None)
-
-        async def on_resolve(data: TData):
-            await self.query.dispatch(DispatchAction.success, data)
+        self.query.reset_polling()
+        if self.limiter is None:
+            await self.query.fetch(self.fetcher)
+        else:
+            async with self.limiter:
+                await self.query.fetch(self.fetcher)
 
-        async def on_error(error):
-            await self.query.dispatch(DispatchAction.error, error)
+    async def refetch_in_background(self):
+        # Polling resumes when the client revalidates its active queries.
+        if not self.options.enabled or self.client.is_page_paused(self.page):
+            return
 
-        async def on_cancel():
-            await self.query.dispatch(DispatchAction.cancel_fetch, None)
+        await self.query.fetch(
+            self.fetcher,
+            silent=True,
+            priority=FetchPriority.background,
+        )
 
-        await self.resolver.resolve(
-            fetcher=self.fetcher,
-            on_resolve=on_resolve,
-            on_error=on_error,
-            on_cancel=on_cancel,
+    async def cancel_fetch(self):
+        """Cancel the query fetch unless another enabled observer needs it."""
+        is_needed = any(
+            observer.options.enabled
+            for observer in self.query.observers
+            if observer is not self
         )
+        if not is_needed:
+            await self.query.cancel()
 
     async def on_query_updated(self):
-        self.notify_listeners()
-        if self.query.state.is_invalidated:
+        self.client.notify_manager.schedule(self.notify_listeners)
+        # The refetch notifies again when it starts; do not fetch twice.
+        state = self.query.state
+        if state.is_invalidated and not state.is_fetching:
             self.fetch()
 
     async def destroy(self):
-        self.query.unsubscribe(self)
-        await self.resolver.cancel()
-        if self.refetch_timer:
-            self.refetch_timer.cancel()
-
-    def schedule_refetch(self):
-        if self.options.refetch_interval is None:
+        await self.cancel_fetch()
+        self.query.release(self)
+        if self in self.query.observers:
+            self.query.unsubscribe(self)
+        self.client.forget_observer(self)
+
+    async def set_query_key(self, query_key: QueryKey):
+        """
+        Observe `query_key` instead, cancelling the fetch of the previous key
+        unless another enabled observer needs it.
+        """
+        if query_key == self.query_key:
             return
-
-        if self.refetch_timer:
-            self.refetch_timer.cancel()
-
-        self.refetch_timer = Timer(
-            self.options.refetch_interval / 1000,
-            self.fetch,
-        )
-        self.refetch_timer.run()
+        is_subscribed = self in self.query.observers
+        if is_subscribed:
+            await self.destroy()
+        else:
+            self.query.release(self)
+        self.query_key = query_key
+        self.query = self._get_query()
+        self.query.set_cache_duration(self.options.cache_duration)
+        self.set_query_options()
+        if is_subscribed:
+            await self.initialize()
+        self.client.notify_manager.schedule(self.notify_listeners)
+
+    def get_refetch_delay(self, unchanged_polls: int) -> Optional[float]:
+        """
+        Return the delay in milliseconds before the next poll this observer
+        asks for, or None if it does not poll.
+
+        With a `refetch_backoff` above 1, the delay grows by that factor for
+        each unchanged poll response, up to `max_refetch_interval`.
+        """
+        interval = self.options.refetch_interval
+        if (
+            interval is None
+            or not self.options.enabled
+            or self.client.is_page_paused(self.page)
+        ):
+            return None
+        if callable(interval):
+            interval = interval(self.query.state)
+            if interval is None:
+                return None
+        backoff = self.options.refetch_backoff
+        if backoff <= 1 or not unchanged_polls:
+            return interval
+        delay = interval * backoff**unchanged_polls
+        return max(interval, min(delay, self.options.max_refetch_interval))
 
     def set_options(
         self,
@@ -140,29 +217,56 @@ class Observer(ChangeNotifier, Generic[TData, TError]):
             refetch_interval=options.refetch_interval,
             retry_count=options.retry_count,
             retry_delay=options.retry_delay,
+            structural_sharing=options.structural_sharing,
+            transform=options.transform,
+            shared=options.shared,
+            refetch_backoff=options.refetch_backoff,
+            max_refetch_interval=options.max_refetch_interval
+            or self.client.default_query_options.max_refetch_interval,
         )
 
+    def set_query_options(self):
+        self.query.structural_sharing = self.options.structural_sharing
+        self.query.retry_count = self.options.retry_count
+        self.query.retry_delay = self.options.retry_delay
+        self.query.transform = self.options.transform
+
+    def _mount_outcome(self) -> MountOutcome:
+        if self.query.state.data_updated_at is None:
+            return MountOutcome.miss
+        if self.query.is_stale(self.options.stale_duration):
+            return MountOutcome.stale_hit
+        return MountOutcome.hit
+
     async def initialize(self):
+        # The query may have been collected while the observer was detached.
+        if self.query.client.query_cache.queries.get(self.query_key) is not self.query:
+            self.query = self._get_query()
+            self.query.set_cache_duration(self.options.cache_duration)
+            self.set_query_options()
+
         self.query.subscribe(self)
+        self.client.add_observer(self)
 
         if self.options.enabled is False:
             return
 
+        await self.query.client.query_cache.wait_for_backend(self.query)
+        # The observer may have been destroyed while the query loaded.
+        if self not in self.query.observers:
+            return
+
         is_refetching = not self.query.state.is_loading
         is_invalidated = self.query.state.is_invalidated
 
+        if self.client.metrics is not None:
+            self.client.metrics.record_mount(self.query.key, self._mount_outcome())
+
         if is_refetching and not is_invalidated:
             if self.options.refetch_on_mount == RefetchOnMount.always:
                 self.fetch()
             elif self.options.refetch_on_mount == RefetchOnMount.stale:
-                is_stale = True
-                stale_at = None
-                if self.query.state.data_updated_at:
-                    stale_at = self.query.state.data_updated_at + timedelta(
-                        milliseconds=self.options.stale_duration
-                    )
-                    is_stale = stale_at < datetime.now()
-                if is_stale:
+                if self.query.is_stale(self.options.stale_duration):
                     self.fetch()
             elif self.options.refetch_on_mount == RefetchOnMount.newer:
                 pass
@@ -0,0 +1,53 @@
+import weakref
+from typing import Callable, Optional
+
+import flet as ft
+
+from .change_notifier import ChangeNotifier
+
+OnlineListener = Callable[[bool], None]
+
+
+class OnlineManager(ChangeNotifier[OnlineListener]):
+    """
+    Tracks whether the sessions are connected, from the connect and
+    disconnect events of the watched pages, each page on its own. Listeners
+    receive the new value when the app or one of the pages goes offline or
+    back online.
+    """
+
+    __slots__ = ("is_online", "_offline_pages")
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Whether the whole app is online; the pages are tracked apart.
+        self.is_online = True
+        self._offline_pages: "weakref.WeakSet[ft.Page]" = weakref.WeakSet()
+
+    def is_page_online(self, page: Optional[ft.Page]) -> bool:
+        return self.is_online and page not in self._offline_pages
+
+    def set_online(self, is_online: bool, page: Optional[ft.Page] = None) -> None:
+        """Set whether `page`, or without a page the whole app, is online."""
+        if page is None:
+            if is_online == self.is_online:
+                return
+            self.is_online = is_online
+        else:
+            if is_online == (page not in self._offline_pages):
+                return
+            if is_online:
+                self._offline_pages.discard(page)
+            else:
+                self._offline_pages.add(page)
+        self.notify_listeners(is_online)
+
+    def watch(self, page: ft.Page) -> None:
+        async def on_connect(e: ft.ControlEvent):
+            self.set_online(True, page)
+
+        async def on_disconnect(e: ft.ControlEvent):
+            self.set_online(False, page)
+
+        page.on_connect.subscribe(on_connect)
+        page.on_disconnect.subscribe(on_disconnect)
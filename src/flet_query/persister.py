@@ -0,0 +1,225 @@
+import asyncio
+import pickle
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from .clock import to_datetime
+from .scheduler import TimerHandle
+from .type import QueryCacheEventType
+
+if TYPE_CHECKING:
+    from .query import QueryKey
+    from .query_cache import QueryCacheEvent
+    from .query_client import QueryClient
+
+
+@dataclass
+class DehydratedQuery:
+    key: "QueryKey"
+    data: Any
+    data_updated_at: datetime
+
+
+class Persister:
+    """
+    Storage for dehydrated queries.
+
+    Methods are called from a worker thread, so implementations must not
+    touch the event loop or the query cache.
+    """
+
+    def save(self, queries: List[DehydratedQuery]) -> None:
+        raise NotImplementedError
+
+    def delete(self, keys: List["QueryKey"]) -> None:
+        raise NotImplementedError
+
+    def load(self) -> List[DehydratedQuery]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class SqlitePersister(Persister):
+    """Stores one row per query key in a local SQLite database."""
+
+    def __init__(self, path: str, table: str = "flet_query"):
+        self.path = path
+        self.table = table
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key BLOB PRIMARY KEY, data BLOB, data_updated_at REAL)"
+        )
+        return connection
+
+    def save(self, queries: List[DehydratedQuery]) -> None:
+        rows = [
+            (
+                pickle.dumps(query.key),
+                pickle.dumps(query.data),
+                query.data_updated_at.timestamp(),
+            )
+            for query in queries
+        ]
+        with self._connect() as connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+                rows,
+            )
+        connection.close()
+
+    def delete(self, keys: List["QueryKey"]) -> None:
+        with self._connect() as connection:
+            connection.executemany(
+                f"DELETE FROM {self.table} WHERE key = ?",
+                [(pickle.dumps(key),) for key in keys],
+            )
+        connection.close()
+
+    def load(self) -> List[DehydratedQuery]:
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT key, data, data_updated_at FROM {self.table}"
+            ).fetchall()
+        connection.close()
+        return [
+            DehydratedQuery(
+                key=pickle.loads(key),
+                data=pickle.loads(data),
+                data_updated_at=datetime.fromtimestamp(data_updated_at),
+            )
+            for key, data, data_updated_at in rows
+        ]
+
+    def clear(self) -> None:
+        with self._connect() as connection:
+            connection.execute(f"DELETE FROM {self.table}")
+        connection.close()
+
+
+class QueryPersistence:
+    """
+    Keeps a persister in sync with the cache of a client.
+
+    Successful queries are written, and removed queries deleted, in the
+    background at most once per `throttle` milliseconds.
+    """
+
+    def __init__(
+        self,
+        client: "QueryClient",
+        persister: Persister,
+        throttle: int = 1000,
+        max_age: int = 86400000,
+    ):
+        """
+        Args:
+            throttle (int): The minimum delay between writes in milliseconds.
+            max_age (int): Restored queries older than this, in milliseconds,
+                are discarded.
+        """
+        self.client = client
+        self.persister = persister
+        self.throttle = throttle
+        self.max_age = max_age
+
+        self._dirty: Dict["QueryKey", bool] = {}
+        self._timer: Optional[TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._unsubscribe: Optional[Callable[[], None]] = None
+
+    def restore(self) -> int:
+        """Hydrate the client from the persister and return the query count."""
+        oldest = datetime.now() - timedelta(milliseconds=self.max_age)
+        queries = [
+            query
+            for query in self.persister.load()
+            if query.data_updated_at >= oldest
+        ]
+        self.client.hydrate(queries)
+        return len(queries)
+
+    def subscribe(self) -> Callable[[], None]:
+        self._unsubscribe = self.client.query_cache.subscribe(self._on_cache_event)
+        return self.unsubscribe
+
+    def unsubscribe(self) -> None:
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_cache_event(self, event: "QueryCacheEvent") -> None:
+        is_changed = False
+        for query in event.queries:
+            if event.type == QueryCacheEventType.removed:
+                self._dirty[query.key] = False
+            elif query.state.is_success:
+                self._dirty[query.key] = True
+            else:
+                continue
+            is_changed = True
+        if not is_changed:
+            return
+
+        if self._timer is None:
+            self._timer = self.client.scheduler.call_later(self.throttle, self.flush)
+
+    async def flush(self) -> None:
+        self._timer = None
+        dirty = self._dirty
+        self._dirty = {}
+
+        saved: List[DehydratedQuery] = []
+        deleted: List["QueryKey"] = []
+        for key, is_saved in dirty.items():
+            query = self.client.query_cache.queries.get(key)
+            if is_saved and query and query.state.data_updated_at:
+                saved.append(
+                    DehydratedQuery(
+                        key=key,
+                        data=query.state.data,
+                        data_updated_at=to_datetime(query.state.data_updated_at),
+                    )
+                )
+            elif not is_saved:
+                deleted.append(key)
+
+        async with self._lock:
+            if saved:
+                await asyncio.to_thread(self.persister.save, saved)
+            if deleted:
+                await asyncio.to_thread(self.persister.delete, deleted)
+
+
+def persist_query_client(
+    client: "QueryClient",
+    persister: Persister,
+    throttle: int = 1000,
+    max_age: int = 86400000,
+) -> QueryPersistence:
+    """
+    Restore the client from `persister` and keep persisting its cache.
+
+    Call it before the first page is built so hydrated data is served at
+    once; observers still refetch it according to their `stale_duration`
+    and `refetch_on_mount`.
+    """
+    persistence = QueryPersistence(
+        client=client,
+        persister=persister,
+        throttle=throttle,
+        max_age=max_age,
+    )
+    persistence.restore()
+    persistence.subscribe()
+    return persistence
@@ -1,15 +1,48 @@
+import asyncio
+import time
+import weakref
+from functools import partial
 from dataclasses import dataclass, replace
 from datetime import datetime
-from typing import TYPE_CHECKING, Any, Generic, List, Optional, TypeVar, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Generic,
+    List,
+    Optional,
+    TypeVar,
+    Tuple,
+    Union,
+)
 
-from .type import DispatchAction, QueryStatus, RefetchOnMount, TData, TError
+from .type import (
+    DispatchAction,
+    FetchPriority,
+    QueryStatus,
+    RefetchOnMount,
+    TData,
+    TError,
+)
+from .cancel_token import CancelToken, bind_cancel_token
+from .clock import from_datetime, now_ns
 from .removable import Removable
+from .retry_resolver import RetryResolver
+from .structural_sharing import StructuralSharing, share_data
 
 if TYPE_CHECKING:
     from .observer import Observer
     from .query_client import QueryClient
+    from .scheduler import Scheduler, TimerHandle
 
 QueryKey = Tuple[Any, ...]
+QueryFn = Callable[[], TData]
+# A delay in milliseconds, or a function of the query state returning one,
+# or None to stop polling.
+RefetchInterval = Union[int, Callable[["QueryState"], Optional[int]]]
+
+# Polls backed off past this many unchanged responses keep the same delay.
+MAX_UNCHANGED_POLLS = 64
 
 
 @dataclass
@@ -20,17 +53,29 @@ class QueryOptions(Generic[TData, TError]):
     refetch_on_mount: RefetchOnMount
     stale_duration: int
     cache_duration: int
-    refetch_interval: Optional[int]
+    refetch_interval: Optional[RefetchInterval]
     retry_count: int = 3
     retry_delay: int = 1500
+    structural_sharing: StructuralSharing = True
+    transform: Optional[Callable[[Any], Any]] = None
+    shared: bool = False
+    refetch_backoff: float = 1
+    max_refetch_interval: int = 300000
 
 
-@dataclass
+@dataclass(slots=True)
 class QueryState(Generic[TData, TError]):
+    """
+    The state of a query, changed in place by its transitions.
+
+    The timestamps are `clock.now_ns()` monotonic nanoseconds; use
+    `clock.to_datetime()` to show them. Copy the state to keep a snapshot.
+    """
+
     data: Optional[TData] = None
     error: Optional[TError] = None
-    data_updated_at: Optional[datetime] = None
-    error_updated_at: Optional[datetime] = None
+    data_updated_at: Optional[int] = None
+    error_updated_at: Optional[int] = None
     is_fetching: bool = False
     status: QueryStatus = QueryStatus.loading
     is_invalidated: bool = False
@@ -47,21 +92,78 @@ class QueryState(Generic[TData, TError]):
     def is_error(self) -> bool:
         return self.status == QueryStatus.error
 
+    def copy(self) -> "QueryState[TData, TError]":
+        return replace(self)
+
 
 class Query(Removable, Generic[TData, TError]):
+    """
+    A cached query. Queries and their state are slotted: an entry holding
+    small data takes about 600 bytes with its cache bookkeeping on CPython
+    3.11, as measured by the `memory_per_query` benchmark in
+    `tests/benchmarks.py`.
+    """
+
+    __slots__ = (
+        "client",
+        "key",
+        "state",
+        "observers",
+        "structural_sharing",
+        "retry_count",
+        "retry_delay",
+        "transform",
+        "fetch_task",
+        "cancel_token",
+        "poll_timer",
+        "unchanged_polls",
+        "pending_observers",
+    )
+
     client: "QueryClient"
     key: QueryKey
 
-    state: QueryState[TData, TError] = QueryState()
-    observers: List["Observer"] = []
+    state: QueryState[TData, TError]
+    observers: List["Observer"]
+    structural_sharing: StructuralSharing
+    retry_count: int
+    retry_delay: int
+    transform: Optional[Callable[[Any], Any]]
+    fetch_task: Optional["asyncio.Task[Optional[TData]]"]
+    cancel_token: Optional[CancelToken]
+    poll_timer: Optional["TimerHandle"]
+    unchanged_polls: int
+    # Observers created for the query that have not subscribed yet.
+    pending_observers: Optional["weakref.WeakSet[Observer]"]
 
     def __init__(
         self,
         client: "QueryClient",
         key: QueryKey,
     ):
+        super().__init__()
         self.client = client
         self.key = key
+        self.state = QueryState()
+        self.observers = []
+        self.structural_sharing = True
+        self.retry_count = 3
+        self.retry_delay = 1500
+        self.transform = None
+        self.fetch_task = None
+        self.cancel_token = None
+        self.poll_timer = None
+        self.unchanged_polls = 0
+        self.pending_observers = None
+
+    @property
+    def scheduler(self) -> "Scheduler":
+        return self.client.scheduler
+
+    def is_stale(self, stale_duration: int) -> bool:
+        if self.state.data_updated_at is None or self.state.is_invalidated:
+            return True
+        return now_ns() - self.state.data_updated_at > stale_duration * 1_000_000
 
     def _reducer(
         self,
@@ -69,72 +171,300 @@ class Query(Removable, Generic[TData, TError]):
         action: DispatchAction,
         data: Optional[TData],
     ):
+        """Apply `action` to `state` in place."""
         if action == DispatchAction.fetch:
-            return replace(
-                state,
-                is_fetching=True,
-                status=(
-                    QueryStatus.loading
-                    if state.data_updated_at is None
-                    else state.status
-                ),
-            )
+            state.is_fetching = True
+            if state.data_updated_at is None:
+                state.status = QueryStatus.loading
         elif action == DispatchAction.cancel_fetch:
-            return replace(
-                state,
-                is_fetching=False,
-            )
+            state.is_fetching = False
         elif action == DispatchAction.error:
-            return replace(
-                state,
-                is_fetching=False,
-                error=data,
-                error_updated_at=datetime.now(),
-                status=QueryStatus.error,
-            )
+            state.is_fetching = False
+            state.error = data
+            state.error_updated_at = now_ns()
+            state.status = QueryStatus.error
         elif action == DispatchAction.success:
-            return replace(
-                state,
-                is_fetching=False,
-                is_invalidated=False,
-                error=None,
-                data=data,
-                data_updated_at=datetime.now(),
-                status=QueryStatus.success,
-            )
+            state.is_fetching = False
+            state.is_invalidated = False
+            state.error = None
+            state.data = data
+            state.data_updated_at = now_ns()
+            state.status = QueryStatus.success
         elif action == DispatchAction.invalidate:
-            return replace(
-                state,
-                is_invalidated=True,
-            )
-        else:
-            return state
+            state.is_invalidated = True
 
     async def dispatch(
         self,
         action: DispatchAction,
         data: Optional[TData],
+        notify: bool = True,
+        update_cache: bool = True,
     ):
-        self.state = self._reducer(self.state, action, data)
-        await self.notify_observers()
-        self.client.query_cache.on_query_updated()
+        """
+        Apply `action`. Bulk operations pass `notify=False` and
+        `update_cache=False` to notify the observers and the cache once all
+        their transitions are applied.
+        """
+        if action == DispatchAction.success and data is not self.state.data:
+            self.unchanged_polls = 0
+        self._reducer(self.state, action, data)
+        if notify:
+            await self.notify_observers()
+        if update_cache:
+            self.client.query_cache.on_query_updated(self)
 
         if action in [DispatchAction.success, DispatchAction.error]:
-            for observer in self.observers:
-                observer.schedule_refetch()
+            self.schedule_poll(restart=True)
+
+    async def fetch(
+        self,
+        fetcher: QueryFn,
+        silent: bool = False,
+        priority: FetchPriority = FetchPriority.visible,
+    ) -> Optional[TData]:
+        """
+        Fetch the query data, sharing the in-flight request.
+
+        Every caller awaiting the query while a fetch is running resolves from
+        that same fetch, so the fetcher is called once per key at a time.
+
+        A silent fetch does not notify observers when it starts, nor when it
+        succeeds with data structurally equal to the current data.
+
+        Each attempt waits for a slot of the client fetch scheduler at the
+        given priority.
+
+        A fetcher taking a `cancel_token` keyword argument receives the
+        `CancelToken` of the fetch. If the fetch is cancelled, the callers
+        get the current data.
+        """
+        task = self.fetch_task
+        if task is None or task.done():
+            task = self.fetch_task = asyncio.ensure_future(
+                self._fetch(fetcher, silent, priority)
+            )
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            current_task = asyncio.current_task()
+            if not task.cancelled() or (
+                current_task is not None and current_task.cancelling()
+            ):
+                raise
+            return self.state.data
+
+    async def _fetch(
+        self,
+        fetcher: QueryFn,
+        silent: bool,
+        priority: FetchPriority,
+    ) -> Optional[TData]:
+        resolver = RetryResolver(self.scheduler)
+        fetch_scheduler = self.client.fetch_scheduler
+        cancel_token = self.cancel_token = CancelToken()
+
+        batch_fetcher = self.client.find_batch_fetcher(self.key)
+        if batch_fetcher is not None:
+            fetcher = partial(batch_fetcher.load, self.key)
+        else:
+            fetcher = bind_cancel_token(fetcher, cancel_token)
+
+        metrics = self.client.metrics
+        started_at = time.perf_counter()
+        attempts = 0
+
+        async def attempt():
+            nonlocal attempts
+            attempts += 1
+            async with fetch_scheduler.slot(self.key, priority):
+                try:
+                    data = await self.client.call_fetcher(fetcher)
+                except Exception:
+                    fetch_scheduler.record_failure(self.key)
+                    raise
+            fetch_scheduler.record_success(self.key)
+            if self.transform is not None:
+                data = await self.client.call_transform(self.transform, data)
+            return data
+
+        await self.dispatch(DispatchAction.fetch, None, notify=not silent)
+
+        async def on_resolve(data: TData):
+            previous = self.state.data
+            data = share_data(self.structural_sharing, previous, data)
+            is_unchanged = data is previous and self.state.is_success
+            if is_unchanged and priority == FetchPriority.background:
+                self.unchanged_polls = min(
+                    self.unchanged_polls + 1,
+                    MAX_UNCHANGED_POLLS,
+                )
+            await self.dispatch(
+                DispatchAction.success,
+                data,
+                notify=not (silent and is_unchanged),
+            )
+            if metrics is not None:
+                self._record_fetch(started_at, attempts, False)
+
+        async def on_error(error):
+            await self.dispatch(DispatchAction.error, error)
+            if metrics is not None:
+                self._record_fetch(started_at, attempts, True)
+
+        try:
+            await resolver.resolve(
+                fetcher=attempt,
+                on_resolve=on_resolve,
+                on_error=on_error,
+                retry_count=self.retry_count,
+                retry_delay=self.retry_delay,
+                get_pause=partial(fetch_scheduler.get_pause, self.key),
+            )
+        except asyncio.CancelledError:
+            cancel_token.cancel()
+            await self.dispatch(DispatchAction.cancel_fetch, None)
+            raise
+        finally:
+            if self.cancel_token is cancel_token:
+                self.cancel_token = None
+        return self.state.data
+
+    def _record_fetch(self, started_at: float, attempts: int, is_error: bool):
+        latency = (time.perf_counter() - started_at) * 1000
+        self.client.metrics.record_fetch(self.key, latency, attempts, is_error)
+
+    async def cancel(self):
+        """
+        Cancel the running fetch, interrupting its fetcher or retry delay,
+        and wait for it to stop.
+        """
+        task = self.fetch_task
+        self.fetch_task = None
+        if task is None or task.done():
+            return
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            current_task = asyncio.current_task()
+            if current_task is not None and current_task.cancelling():
+                raise
+
+    def schedule_poll(self, restart: bool = False):
+        """
+        Arm the single poll timer of the query for all of its observers, at
+        the shortest delay they request. Unless `restart` is set, an earlier
+        timer is kept, so mounting observers do not postpone the next poll.
+        """
+        delay = self.get_poll_delay()
+        timer = self.poll_timer
+        if timer is not None:
+            if (
+                not restart
+                and delay is not None
+                and timer.deadline <= self.scheduler.time() + delay / 1000
+            ):
+                return
+            timer.cancel()
+            self.poll_timer = None
+        if delay is not None:
+            self.poll_timer = self.scheduler.call_later(delay, self._poll)
+
+    def get_poll_delay(self) -> Optional[float]:
+        poll_delay = None
+        for observer in self.observers:
+            delay = observer.get_refetch_delay(self.unchanged_polls)
+            if delay is not None and (poll_delay is None or delay < poll_delay):
+                poll_delay = delay
+        return poll_delay
+
+    def reset_polling(self):
+        """Drop the poll delay back to its base rate, e.g. on interaction."""
+        if self.unchanged_polls:
+            self.unchanged_polls = 0
+            self.schedule_poll()
+
+    async def _poll(self):
+        self.poll_timer = None
+        for observer in self.observers:
+            if observer.get_refetch_delay(self.unchanged_polls) is not None:
+                await observer.refetch_in_background()
+                break
+        # A cancelled fetch settles without rescheduling the poll.
+        if self.poll_timer is None:
+            self.schedule_poll()
+
+    def hydrate(self, data: TData, data_updated_at: datetime):
+        timestamp = from_datetime(data_updated_at)
+        if self.state.data_updated_at and self.state.data_updated_at >= timestamp:
+            return
+
+        self.state.data = data
+        self.state.data_updated_at = timestamp
+        self.state.error = None
+        self.state.status = QueryStatus.success
+        self.on_state_changed()
+
+    def set_state(self, state: QueryState[TData, TError]):
+        """Replace the state outside of a fetch, e.g. to restore a snapshot."""
+        self.state = state
+        self.on_state_changed()
+
+    def on_state_changed(self):
+        for observer in self.observers:
+            self.client.notify_manager.schedule(observer.notify_listeners)
+        self.client.query_cache.on_query_updated(self)
+
+    @property
+    def is_observed(self) -> bool:
+        """Whether an observer subscribed to the query or is about to."""
+        return bool(self.observers) or bool(self.pending_observers)
+
+    def hold(self, observer: "Observer"):
+        """
+        Keep the query from eviction for `observer` until it subscribes, e.g.
+        while the control of a hook is not mounted yet.
+        """
+        if self.pending_observers is None:
+            self.pending_observers = weakref.WeakSet()
+        self.pending_observers.add(observer)
+
+    def release(self, observer: "Observer"):
+        if self.pending_observers is None:
+            return
+        self.pending_observers.discard(observer)
+        if not self.pending_observers:
+            self.pending_observers = None
 
     def subscribe(self, observer: "Observer"):
+        self.release(observer)
         self.observers.append(observer)
         self.cancel_garbage_collection()
+        self.client.query_cache.touch(self.key)
+        if self.client.metrics is not None:
+            self.client.metrics.record_observers(self.key, 1)
+        if observer.get_refetch_delay(self.unchanged_polls) is not None:
+            self.schedule_poll()
 
     def unsubscribe(self, observer: "Observer"):
         self.observers.remove(observer)
         self.schedule_garbage_collection()
+        self.client.query_cache.evict()
+        if self.client.metrics is not None:
+            self.client.metrics.record_observers(self.key, -1)
+        if self.poll_timer is not None:
+            self.schedule_poll()
 
     async def notify_observers(self):
+        if self.client.metrics is not None:
+            self.client.metrics.record_notification(self.key, len(self.observers))
         for observer in self.observers:
             await observer.on_query_updated()
 
     def on_garbage_collection(self):
         super().on_garbage_collection()
+        if self.observers or self.client.query_cache.queries.get(self.key) is not self:
+            return
         self.client.query_cache.remove(self.key)
@@ -1,7 +1,35 @@
-from typing import TYPE_CHECKING, Any, Callable, Dict, Generic, Optional
+import asyncio
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Type,
+)
 
+from .cache_backend import CacheBackend, CacheChange
+from .clock import to_datetime
+from .key_index import KeyIndex
+from .persister import DehydratedQuery
 from .query import Query, QueryKey
-from .type import TData, TError
+from .type import (
+    CacheChangeType,
+    DispatchAction,
+    EvictionPolicy,
+    QueryCacheEventType,
+    TData,
+    TError,
+)
 from .change_notifier import ChangeNotifier
 
 if TYPE_CHECKING:
@@ -9,41 +37,362 @@ if TYPE_CHECKING:
 
 QueriesMap = Dict[QueryKey, Query[TData, TError]]
 
-QueryCacheListener = Callable[[], None]
+
+@dataclass
+class QueryCacheEvent:
+    """
+    A change of the cache. The bulk operations of the client emit a single
+    event for all the queries they change, with `query` set to None; listen
+    to `queries` to handle both.
+    """
+
+    type: QueryCacheEventType
+    query: Optional[Query]
+    queries: Sequence[Query] = ()
+
+
+QueryCacheListener = Callable[[QueryCacheEvent], None]
+
+
+@dataclass
+class QueryCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate the number of bytes held by `value` and its containers."""
+    size = 0
+    seen = set()
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.append(vars(item))
+    return size
 
 
 class QueryCache(Generic[TData, TError], ChangeNotifier[QueryCacheListener]):
-    queries: QueriesMap = {}
+    queries: QueriesMap
+    index: KeyIndex[Query[TData, TError]]
+
+    max_queries: Optional[int]
+    max_bytes: Optional[int]
+    eviction_policy: EvictionPolicy
+    stats: QueryCacheStats
+    size_bytes: int
+    fetching: Set[QueryKey]
+    backend: Optional[CacheBackend]
+
+    def __init__(
+        self,
+        max_queries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        eviction_policy: EvictionPolicy = EvictionPolicy.lru,
+        backend: Optional[CacheBackend] = None,
+    ) -> None:
+        """
+        Args:
+            max_queries (Optional[int]): The maximum number of cached queries.
+            max_bytes (Optional[int]): The approximate budget, in bytes, for
+                the data of all cached queries.
+            eviction_policy (EvictionPolicy): The order in which inactive
+                queries are evicted once a limit is exceeded. Queries with
+                observers or a running fetch are never evicted.
+            backend (Optional[CacheBackend]): Storage shared with the caches
+                of other processes. Successful results are written to it, new
+                queries start from its data, and invalidations made by any
+                process apply to all of them.
+        """
+        super().__init__()
+        self.queries = {}
+        self.index = KeyIndex()
+
+        self.max_queries = max_queries
+        self.max_bytes = max_bytes
+        self.eviction_policy = eviction_policy
+        self.stats = QueryCacheStats()
+        self.size_bytes = 0
+        # Keys of the cached queries with a running fetch.
+        self.fetching = set()
+
+        # Ordered by recency of use, oldest first; values are use counts.
+        self._usage: "OrderedDict[QueryKey, int]" = OrderedDict()
+        self._sizes: Dict[QueryKey, int] = {}
+        self._sized_data: Dict[QueryKey, Any] = {}
+
+        # The data last written to or read from the backend, per key, and
+        # the reads of the backend still running.
+        self._synced_data: Dict[QueryKey, Any] = {}
+        self._loads: Dict[QueryKey, "asyncio.Future[Optional[DehydratedQuery]]"] = {}
+        self.backend = backend
+        if backend is not None:
+            backend.subscribe(self._on_backend_change)
 
     def get(
         self,
         key: QueryKey,
     ) -> Optional[Query[TData, TError]]:
-        return self.queries.get(key)
+        query = self.queries.get(key)
+        if query is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+            self.touch(key)
+        return query
 
     def add(
         self,
         query_key: QueryKey,
         query: Query[TData, TError],
+        notify: bool = True,
     ) -> None:
         self.queries[query_key] = query
-        self.notify_listeners()
+        self.index.set(query_key, query)
+        self._usage.pop(query_key, None)
+        self._usage[query_key] = 1
+        self.fetching.discard(query_key)
+        self._update_size(query)
+        # The new query has no observers yet; keep it until they subscribe.
+        self.evict(keep=query)
+        if notify:
+            self._notify(QueryCacheEventType.added, query)
+        if self.backend is not None:
+            self._load_from_backend(query)
 
     def remove(
         self,
         query_key: QueryKey,
     ) -> None:
-        del self.queries[query_key]
-        self.notify_listeners()
+        query = self._remove(query_key)
+        self._notify(QueryCacheEventType.removed, query)
+
+    def remove_many(self, queries: Iterable[Query[TData, TError]]) -> None:
+        """Remove `queries`, emitting a single event."""
+        removed = [
+            self._remove(query.key)
+            for query in queries
+            if self.queries.get(query.key) is query
+        ]
+        if removed:
+            self._notify_many(QueryCacheEventType.removed, removed)
+
+    def _remove(self, query_key: QueryKey) -> Query[TData, TError]:
+        query = self.queries.pop(query_key)
+        self.index.delete(query_key)
+        self._usage.pop(query_key, None)
+        self._sized_data.pop(query_key, None)
+        self._synced_data.pop(query_key, None)
+        self._loads.pop(query_key, None)
+        self.size_bytes -= self._sizes.pop(query_key, 0)
+        self.fetching.discard(query_key)
+        return query
+
+    def _notify(self, type: QueryCacheEventType, query: Query[TData, TError]) -> None:
+        self.notify_listeners(QueryCacheEvent(type, query, (query,)))
+
+    def _notify_many(
+        self,
+        type: QueryCacheEventType,
+        queries: List[Query[TData, TError]],
+    ) -> None:
+        self.notify_listeners(QueryCacheEvent(type, None, queries))
+
+    def touch(self, query_key: QueryKey) -> None:
+        if query_key in self._usage:
+            self._usage[query_key] += 1
+            self._usage.move_to_end(query_key)
+
+    def find_queries(
+        self,
+        prefix: QueryKey,
+        exact: bool = False,
+    ) -> List[Query[TData, TError]]:
+        return self.index.find(prefix, exact=exact)
 
     def build(
         self,
         query_key: QueryKey,
         query_client: "QueryClient",
+        query_class: Type[Query] = Query,
+        notify: bool = True,
     ):
-        query = Query(query_client, query_key)
-        self.add(query_key, query)
+        """
+        Create and add a query. Without `notify`, no `added` event is
+        emitted; bulk operations report the query in their own event.
+        """
+        query = query_class(query_client, query_key)
+        self.add(query_key, query, notify=notify)
         return query
 
-    def on_query_updated(self):
-        self.notify_listeners()
+    def on_query_updated(self, query: Query[TData, TError]):
+        if not self._sync_query(query):
+            return
+        self._notify(QueryCacheEventType.updated, query)
+        self.evict()
+
+    def on_queries_updated(self, queries: Iterable[Query[TData, TError]]):
+        """Handle the updates of many queries, emitting a single event."""
+        updated = [query for query in queries if self._sync_query(query)]
+        if not updated:
+            return
+        self._notify_many(QueryCacheEventType.updated, updated)
+        self.evict()
+
+    def _sync_query(self, query: Query[TData, TError]) -> bool:
+        """Bring the bookkeeping of a cached query up to date with its state."""
+        if self.queries.get(query.key) is not query:
+            return False
+        if query.state.is_fetching:
+            self.fetching.add(query.key)
+        else:
+            self.fetching.discard(query.key)
+        self._update_size(query)
+        if self.backend is not None:
+            self._save_to_backend(query)
+        return True
+
+    def _call_backend(self, fn: Callable[..., Any], *args: Any) -> None:
+        # Writes are not awaited; the worker thread keeps them in order.
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            fn(*args)
+            return
+        assert self.backend is not None
+        self.backend.run(fn, *args)
+
+    def _save_to_backend(self, query: Query[TData, TError]) -> None:
+        assert self.backend is not None
+        state = query.state
+        if (
+            not state.is_success
+            or state.data_updated_at is None
+            or state.data is self._synced_data.get(query.key)
+        ):
+            return
+        self._synced_data[query.key] = state.data
+        self._call_backend(
+            self.backend.set,
+            DehydratedQuery(
+                key=query.key,
+                data=state.data,
+                data_updated_at=to_datetime(state.data_updated_at),
+            ),
+        )
+
+    def _load_from_backend(self, query: Query[TData, TError]) -> None:
+        assert self.backend is not None
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._hydrate_from_backend(query, self.backend.get(query.key))
+            return
+        future = self.backend.run(self.backend.get, query.key)
+        self._loads[query.key] = future
+        future.add_done_callback(partial(self._on_backend_loaded, query))
+
+    def _on_backend_loaded(
+        self,
+        query: Query[TData, TError],
+        future: "asyncio.Future[Optional[DehydratedQuery]]",
+    ) -> None:
+        if self._loads.get(query.key) is future:
+            del self._loads[query.key]
+        if not future.cancelled():
+            self._hydrate_from_backend(query, future.result())
+
+    async def wait_for_backend(self, query: Query[TData, TError]) -> None:
+        """
+        Wait until the backend entry of `query` is loaded, if it is being
+        read, so the query is not fetched again when another process already
+        holds fresh data.
+        """
+        future = self._loads.get(query.key)
+        if future is not None:
+            await asyncio.wait([future])
+
+    def _hydrate_from_backend(
+        self,
+        query: Query[TData, TError],
+        entry: Optional[DehydratedQuery],
+    ) -> None:
+        if entry is None or self.queries.get(query.key) is not query:
+            return
+        self._synced_data[query.key] = entry.data
+        query.hydrate(entry.data, entry.data_updated_at)
+
+    def invalidate_backend(self, prefix: QueryKey, exact: bool = False) -> None:
+        """Drop the backend entries under `prefix` in every process."""
+        assert self.backend is not None
+        self._call_backend(self.backend.invalidate, prefix, exact)
+        self._forget_synced(prefix, exact)
+
+    def _forget_synced(self, prefix: QueryKey, exact: bool) -> None:
+        # The entries are gone from the backend, so the next result must be
+        # written even if it is the data that was synced before.
+        for query in self.find_queries(prefix, exact=exact):
+            self._synced_data.pop(query.key, None)
+
+    def _on_backend_change(self, change: CacheChange) -> None:
+        if change.type == CacheChangeType.set:
+            query = self.queries.get(change.key)
+            if query is not None:
+                self._load_from_backend(query)
+        elif change.type == CacheChangeType.invalidate:
+            self._forget_synced(change.key, change.exact)
+            for query in self.find_queries(change.key, exact=change.exact):
+                asyncio.ensure_future(query.dispatch(DispatchAction.invalidate, None))
+
+    def evict(self, keep: Optional[Query[TData, TError]] = None) -> None:
+        if not self._is_over_budget():
+            return
+
+        candidates = (
+            query
+            for query in map(self.queries.__getitem__, list(self._usage))
+            if query is not keep and self._is_evictable(query)
+        )
+        if self.eviction_policy == EvictionPolicy.lfu:
+            # The sort is stable, so equally used queries go in LRU order.
+            candidates = iter(
+                sorted(candidates, key=lambda query: self._usage[query.key])
+            )
+
+        for query in candidates:
+            if not self._is_over_budget():
+                break
+            query.cancel_garbage_collection()
+            self.remove(query.key)
+            self.stats.evictions += 1
+
+    def _is_evictable(self, query: Query[TData, TError]) -> bool:
+        return not query.is_observed and not query.state.is_fetching
+
+    def _is_over_budget(self) -> bool:
+        if self.max_queries is not None and len(self.queries) > self.max_queries:
+            return True
+        if self.max_bytes is not None and self.size_bytes > self.max_bytes:
+            return True
+        return False
+
+    def _update_size(self, query: Query[TData, TError]) -> None:
+        if self.max_bytes is None:
+            return
+        data = query.state.data
+        if query.key in self._sizes and self._sized_data.get(query.key) is data:
+            return
+        size = estimate_size(data)
+        self.size_bytes += size - self._sizes.get(query.key, 0)
+        self._sizes[query.key] = size
+        self._sized_data[query.key] = data
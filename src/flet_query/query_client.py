@@ -1,11 +1,42 @@
+import asyncio
+import inspect
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Callable, Optional
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
+from .batch_fetcher import BatchFetcher, BatchFn
+from .clock import to_datetime
+from .fetch_scheduler import FetchScheduler
+from .focus_manager import FocusManager
+from .metrics import QueryMetrics
+from .mutation_cache import MutationCache
+from .notify_manager import NotifyManager
+from .online_manager import OnlineManager
+from .persister import DehydratedQuery
 from .query_cache import QueryCache
-from .type import DispatchAction, RefetchOnMount, TData
+from .scheduler import Scheduler, TimerHandle, default_scheduler
+from .type import DispatchAction, FetchPriority, RefetchOnMount, TData
 
 if TYPE_CHECKING:
-    from .query import QueryKey
+    import flet as ft
+
+    from .observer import Observer
+    from .query import Query, QueryFn, QueryKey
 
 
 @dataclass
@@ -16,31 +47,295 @@ class DefaultQueryOptions:
     stale_duration: int = 0
     cache_duration: int = 300000
     refetch_interval: Optional[int] = None
+    max_refetch_interval: int = 300000
     retry_count: int = 3
     retry_delay: int = 1500
 
 
 class QueryClient:
-    query_cache: QueryCache = QueryCache()
+    query_cache: QueryCache
     default_query_options: DefaultQueryOptions = DefaultQueryOptions()
+    scheduler: Scheduler = default_scheduler
+    notify_manager: NotifyManager
+    batch_fetchers: Dict["QueryKey", BatchFetcher]
+    mutation_cache: MutationCache
+    fetch_scheduler: FetchScheduler
+    max_workers: Optional[int] = None
+    metrics: Optional[QueryMetrics] = None
+    shared_client: Optional["QueryClient"] = None
+    focus_manager: FocusManager
+    online_manager: OnlineManager
+    observers: Dict[Optional["ft.Page"], Set["Observer"]]
+    revalidate_throttle: int = 1000
+    _executor: Optional[Executor] = None
+    _transform_executor: Optional[Executor] = None
+    _revalidate_timer: Optional[TimerHandle] = None
+    _revalidated_at: Optional[float] = None
+    _tasks: Set["asyncio.Task[Any]"]
 
     def __init__(
         self,
         default_query_options: Optional[DefaultQueryOptions] = None,
+        scheduler: Optional[Scheduler] = None,
+        notify_window: int = 0,
+        query_cache: Optional[QueryCache] = None,
+        fetch_scheduler: Optional[FetchScheduler] = None,
+        executor: Optional[Executor] = None,
+        transform_executor: Optional[Executor] = None,
+        max_workers: Optional[int] = None,
+        metrics: Optional[QueryMetrics] = None,
+        focus_manager: Optional[FocusManager] = None,
+        online_manager: Optional[OnlineManager] = None,
+        revalidate_throttle: int = 1000,
+        shared_client: Optional["QueryClient"] = None,
     ):
+        """
+        Args:
+            notify_window (int): How long, in milliseconds, observer
+                notifications are collected before the UI is updated. With 0
+                they are flushed at the end of the current event loop tick.
+            query_cache (Optional[QueryCache]): The cache to use, e.g. one
+                configured with `max_queries` or `max_bytes`.
+            fetch_scheduler (Optional[FetchScheduler]): Limits, priorities and
+                circuit breaking applied to every fetch of the client.
+            executor (Optional[Executor]): Runs synchronous fetchers. Defaults
+                to a thread pool of `max_workers` threads created on first use.
+            transform_executor (Optional[Executor]): Runs query transforms,
+                e.g. a `ProcessPoolExecutor` for CPU-heavy parsing. Defaults to
+                `executor`.
+            metrics (Optional[QueryMetrics]): Collects fetch, cache and
+                notification metrics. Nothing is recorded without it.
+            focus_manager (Optional[FocusManager]): Tracks whether the app and
+                each of its pages are visible. The observers of a hidden page
+                stop polling.
+            online_manager (Optional[OnlineManager]): Tracks whether the app and
+                each session are connected. The observers of an offline page
+                stop polling.
+            revalidate_throttle (int): The minimum time, in milliseconds,
+                between two revalidations of the active queries when the app
+                becomes visible or reconnects.
+            shared_client (Optional[QueryClient]): Holds the queries marked
+                `shared=True`, e.g. one client for the whole process whose
+                queries every session reads. Manage those queries, e.g.
+                invalidate them, through this client.
+        """
+        self.query_cache = query_cache if query_cache is not None else QueryCache()
         self.default_query_options = default_query_options or DefaultQueryOptions()
+        self.scheduler = scheduler if scheduler is not None else default_scheduler
+        self.notify_manager = NotifyManager(
+            window=notify_window,
+            scheduler=self.scheduler,
+        )
+        self.batch_fetchers = {}
+        self.mutation_cache = MutationCache()
+        self.fetch_scheduler = fetch_scheduler or FetchScheduler()
+        self._executor = executor
+        self._transform_executor = transform_executor
+        self.max_workers = max_workers
+        self.metrics = metrics
+        self.shared_client = shared_client
+        self.focus_manager = focus_manager or FocusManager()
+        self.online_manager = online_manager or OnlineManager()
+        self.revalidate_throttle = revalidate_throttle
+        self._watched_pages: "weakref.WeakSet[ft.Page]" = weakref.WeakSet()
+        # The mounted observers created with this client by page, and those
+        # detached from shared queries while their page is disconnected.
+        self.observers = {}
+        self._detached_observers: Dict[Optional["ft.Page"], Set["Observer"]] = {}
+        self._tasks = set()
+        self.focus_manager.subscribe(self._on_activity_changed)
+        self.online_manager.subscribe(self._on_activity_changed)
+
+    def get_query_client(self, shared: bool) -> "QueryClient":
+        """Return the client holding the queries, shared or not."""
+        if shared and self.shared_client is not None:
+            return self.shared_client
+        return self
+
+    @property
+    def is_paused(self) -> bool:
+        """Whether every watched page is hidden or offline, so polling is paused."""
+        if not self._watched_pages:
+            return self.is_page_paused(None)
+        return all(self.is_page_paused(page) for page in self._watched_pages)
+
+    def is_page_paused(self, page: Optional["ft.Page"]) -> bool:
+        """
+        Whether `page` is hidden or offline, so the observers created on it do
+        not poll. Other pages sharing the client keep polling.
+        """
+        return not (
+            self.focus_manager.is_page_focused(page)
+            and self.online_manager.is_page_online(page)
+        )
+
+    def watch_page(self, page: "ft.Page") -> None:
+        """
+        Follow the visibility and connection of `page`. While it is
+        disconnected, the observers of shared queries created on it are
+        detached, and all of its observers are destroyed when its session
+        closes, so the process-wide shared queries do not keep observers of
+        dead sessions. The observers of other pages using the same client are
+        left alone.
+        """
+        if page in self._watched_pages:
+            return
+        self._watched_pages.add(page)
+        self.focus_manager.watch(page)
+        self.online_manager.watch(page)
+
+        async def on_connect(e: "ft.ControlEvent"):
+            await self.attach_shared_observers(page)
+
+        async def on_disconnect(e: "ft.ControlEvent"):
+            await self.detach_shared_observers(page)
+
+        async def on_close(e: "ft.ControlEvent"):
+            await self.destroy_observers(page)
+
+        page.on_connect.subscribe(on_connect)
+        page.on_disconnect.subscribe(on_disconnect)
+        page.on_close.subscribe(on_close)
+
+    def run_task(self, handler: Callable[..., Awaitable[Any]], *args: Any):
+        """Run `handler` as a task kept alive by the client until it is done."""
+        task = asyncio.ensure_future(handler(*args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def add_observer(self, observer: "Observer") -> None:
+        self.observers.setdefault(observer.page, set()).add(observer)
+
+    def forget_observer(self, observer: "Observer") -> None:
+        for observers in (self.observers, self._detached_observers):
+            page_observers = observers.get(observer.page)
+            if page_observers is None:
+                continue
+            page_observers.discard(observer)
+            if not page_observers:
+                del observers[observer.page]
+
+    async def detach_shared_observers(self, page: Optional["ft.Page"]):
+        """
+        Unsubscribe the observers of shared queries created on `page` until
+        they are reattached.
+        """
+        for observer in list(self.observers.get(page, ())):
+            if observer.query.client is not self:
+                await observer.destroy()
+                self._detached_observers.setdefault(page, set()).add(observer)
+
+    async def attach_shared_observers(self, page: Optional["ft.Page"]):
+        for observer in self._detached_observers.pop(page, ()):
+            await observer.initialize()
+
+    async def destroy_observers(self, page: Optional["ft.Page"]):
+        """Destroy the observers created on `page`, e.g. when its session ends."""
+        self._detached_observers.pop(page, None)
+        for observer in list(self.observers.get(page, ())):
+            await observer.destroy()
+
+    def _on_activity_changed(self, is_active: bool) -> None:
+        if not is_active or self.is_paused or self._revalidate_timer is not None:
+            return
+
+        delay = 0.0
+        if self._revalidated_at is not None:
+            elapsed = (self.scheduler.time() - self._revalidated_at) * 1000
+            delay = max(0, self.revalidate_throttle - elapsed)
+        self._revalidate_timer = self.scheduler.call_later(
+            delay,
+            self.revalidate_active_queries,
+        )
+
+    async def revalidate_active_queries(self):
+        """
+        Refetch the stale queries with enabled observers and resume their
+        polling, e.g. when the app becomes visible or reconnects.
+        """
+        self._revalidate_timer = None
+        self._revalidated_at = self.scheduler.time()
+        if self.is_paused:
+            return
+
+        queries = list(self.query_cache.queries.values())
+        if self.shared_client is not None:
+            queries.extend(self.shared_client.query_cache.queries.values())
+
+        fetches = []
+        for query in queries:
+            observers = [
+                observer
+                for observer in query.observers
+                if observer.client is self
+                and observer.options.enabled
+                and not self.is_page_paused(observer.page)
+            ]
+            if not observers:
+                continue
+            stale_duration = min(
+                observer.options.stale_duration for observer in observers
+            )
+            if query.is_stale(stale_duration):
+                # A finished fetch schedules the next poll of the query.
+                fetches.append(observers[0].fetch_async())
+            else:
+                query.schedule_poll()
+
+        await asyncio.gather(*fetches, return_exceptions=True)
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="flet-query",
+            )
+        return self._executor
+
+    @property
+    def transform_executor(self) -> Executor:
+        return self._transform_executor or self.executor
+
+    async def call_fetcher(self, fetcher: Callable[..., Any], *args: Any) -> Any:
+        """
+        Call `fetcher`, running it on the executor unless it is a coroutine
+        function, so synchronous fetchers do not block the event loop.
+        """
+        if inspect.iscoroutinefunction(fetcher):
+            return await fetcher(*args)
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, partial(fetcher, *args))
+        if inspect.isawaitable(result):
+            return await result
+        return result
+
+    async def call_transform(self, transform: Callable[[Any], Any], data: Any) -> Any:
+        if inspect.iscoroutinefunction(transform):
+            return await transform(data)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.transform_executor, transform, data)
+
+    def batch(self):
+        """
+        Group cache changes so observers are notified and pages updated once,
+        when the outermost batch exits.
+        """
+        return self.notify_manager.batch()
 
     async def set_query_data(
         self,
         query_key: "QueryKey",
         updater: Callable[[Optional[TData]], TData],
     ):
-        query = self.query_cache.get(query_key)
-        if query:
-            await query.dispatch(
-                DispatchAction.success,
-                updater(query.state.data),
-            )
+        query = self._ensure_query(query_key)
+        await query.dispatch(
+            DispatchAction.success,
+            updater(query.state.data),
+        )
 
     def get_query_data(
         self,
@@ -50,34 +345,214 @@ class QueryClient:
         if query:
             return query.state.data
 
+    async def set_queries_data(
+        self,
+        queries: Union[Mapping["QueryKey", Any], "QueryKey"],
+        updater: Optional[Callable[[Optional[TData]], TData]] = None,
+        exact: bool = False,
+    ):
+        """
+        Set the data of many queries at once: either from a mapping of query
+        keys to data, creating the missing queries, or by applying `updater`
+        to the data of every cached query under a prefix.
+
+        All the queries are updated before anything is notified; each
+        observer is then notified once, and the cache emits a single event.
+        """
+        if isinstance(queries, Mapping):
+            updates = [
+                (self._ensure_query(query_key, notify=False), data)
+                for query_key, data in queries.items()
+            ]
+        else:
+            if updater is None:
+                raise TypeError("set_queries_data() needs an updater for a prefix")
+            updates = [
+                (query, updater(query.state.data))
+                for query in self.find_queries(queries, exact=exact)
+            ]
+        await self._dispatch_many(DispatchAction.success, updates)
+
+    def get_queries_data(
+        self,
+        prefix: "QueryKey",
+        exact: bool = False,
+    ) -> Dict["QueryKey", Any]:
+        """Return the data of the cached queries under `prefix`, by key."""
+        return {
+            query.key: query.state.data
+            for query in self.find_queries(prefix, exact=exact)
+        }
+
+    def remove_queries(
+        self,
+        prefix: "QueryKey" = (),
+        exact: bool = False,
+    ):
+        """
+        Remove the queries under `prefix` from the cache, emitting a single
+        event. Their observers keep their state until they mount again.
+        """
+        queries = self.find_queries(prefix, exact=exact)
+        for query in queries:
+            query.cancel_garbage_collection()
+        self.query_cache.remove_many(queries)
+
+    async def _dispatch_many(
+        self,
+        action: DispatchAction,
+        updates: List[Tuple["Query", Any]],
+    ):
+        with self.batch():
+            for query, data in updates:
+                await query.dispatch(action, data, notify=False, update_cache=False)
+            for query, _ in updates:
+                await query.notify_observers()
+            self.query_cache.on_queries_updated(query for query, _ in updates)
+
+    async def prefetch_query(
+        self,
+        query_key: "QueryKey",
+        fetcher: "QueryFn",
+        stale_duration: Optional[int] = None,
+    ):
+        """
+        Fetch the query into the cache unless its data is still fresh, so a
+        control mounting later is served from the cache. Errors are ignored.
+        """
+        query = self._ensure_query(query_key)
+        await self.query_cache.wait_for_backend(query)
+        if stale_duration is None:
+            stale_duration = self.default_query_options.stale_duration
+        if query.is_stale(stale_duration):
+            await query.fetch(fetcher, priority=FetchPriority.prefetch)
+
+    async def ensure_query_data(
+        self,
+        query_key: "QueryKey",
+        fetcher: "QueryFn",
+        stale_duration: Optional[int] = None,
+    ) -> Optional[TData]:
+        """
+        Return the cached data of the query, fetching it first if there is
+        none. With `stale_duration`, stale cached data is refetched as well.
+        """
+        query = self._ensure_query(query_key)
+        await self.query_cache.wait_for_backend(query)
+        is_missing = query.state.data_updated_at is None
+        if is_missing or (
+            stale_duration is not None and query.is_stale(stale_duration)
+        ):
+            await query.fetch(fetcher)
+            if query.state.is_error:
+                raise query.state.error
+        return query.state.data
+
+    def find_queries(
+        self,
+        prefix: "QueryKey",
+        exact: bool = False,
+    ) -> List["Query"]:
+        return self.query_cache.find_queries(prefix, exact=exact)
+
     async def invalidate_queries(
         self,
         key: "QueryKey",
         exact: bool = False,
     ):
-        for query_key, query in self.query_cache.queries.items():
-            if exact:
-                if query_key == key:
-                    await query.dispatch(
-                        DispatchAction.invalidate,
-                        None,
-                    )
-            else:
-                is_partial_match = (
-                    len(query_key) >= len(key) and query_key[: len(key)] == key
-                )
-                if is_partial_match:
-                    await query.dispatch(
-                        DispatchAction.invalidate,
-                        None,
-                    )
+        if self.query_cache.backend is not None:
+            self.query_cache.invalidate_backend(key, exact=exact)
+        await self._dispatch_many(
+            DispatchAction.invalidate,
+            [(query, None) for query in self.find_queries(key, exact=exact)],
+        )
+
+    async def cancel_queries(
+        self,
+        prefix: "QueryKey" = (),
+        exact: bool = False,
+    ):
+        """Cancel the running fetches of the queries under `prefix`."""
+        await asyncio.gather(
+            *(query.cancel() for query in self.find_queries(prefix, exact=exact))
+        )
+
+    def dehydrate(self, prefix: "QueryKey" = ()) -> List[DehydratedQuery]:
+        return [
+            DehydratedQuery(
+                key=query.key,
+                data=query.state.data,
+                data_updated_at=to_datetime(query.state.data_updated_at),
+            )
+            for query in self.find_queries(prefix)
+            if query.state.is_success and query.state.data_updated_at
+        ]
+
+    def hydrate(self, queries: Iterable[DehydratedQuery]):
+        for dehydrated in queries:
+            query = self._ensure_query(dehydrated.key)
+            query.hydrate(dehydrated.data, dehydrated.data_updated_at)
+
+    async def fetch_queries(
+        self,
+        queries: Iterable[Tuple["QueryKey", "QueryFn"]],
+        concurrency: Optional[int] = None,
+    ) -> List[Any]:
+        """
+        Fetch several queries together, at most `concurrency` at a time, and
+        return their data in order.
+        """
+        limiter = asyncio.Semaphore(concurrency) if concurrency else None
+
+        async def fetch(query_key: "QueryKey", fetcher: "QueryFn"):
+            query = self._ensure_query(query_key)
+            if limiter is None:
+                return await query.fetch(fetcher, priority=FetchPriority.prefetch)
+            async with limiter:
+                return await query.fetch(fetcher, priority=FetchPriority.prefetch)
+
+        return await asyncio.gather(
+            *(fetch(query_key, fetcher) for query_key, fetcher in queries)
+        )
+
+    def register_batch_fetcher(
+        self,
+        prefix: "QueryKey",
+        fn: BatchFn,
+        max_batch: int = 100,
+        window: int = 5,
+    ) -> BatchFetcher:
+        """
+        Fetch every query whose key starts with `prefix` through `fn`, which
+        loads a list of keys in one call. Keys requested within `window`
+        milliseconds are batched together, up to `max_batch` keys per call.
+        """
+        batch_fetcher = BatchFetcher(
+            fn=fn,
+            max_batch=max_batch,
+            window=window,
+            scheduler=self.scheduler,
+        )
+        self.batch_fetchers[prefix] = batch_fetcher
+        return batch_fetcher
+
+    def find_batch_fetcher(self, query_key: "QueryKey") -> Optional[BatchFetcher]:
+        if not self.batch_fetchers:
+            return None
+        for length in range(len(query_key), -1, -1):
+            batch_fetcher = self.batch_fetchers.get(query_key[:length])
+            if batch_fetcher is not None:
+                return batch_fetcher
+        return None
+
+    def _ensure_query(self, query_key: "QueryKey", notify: bool = True) -> "Query":
+        query = self.query_cache.get(query_key)
+        if query is None:
+            query = self.query_cache.build(query_key, self, notify=notify)
+            # Nothing observes the query yet; collect it unless something does.
+            query.schedule_garbage_collection()
+        return query
 
     @property
     def is_fetching(self):
-        return len(
-            [
-                query
-                for query in self.query_cache.queries.values()
-                if query.state.is_fetching
-            ]
-        )
+        return len(self.query_cache.fetching)
@@ -1,17 +1,28 @@
-from threading import Timer
 from typing import Optional
 
+from .scheduler import Scheduler, TimerHandle, default_scheduler
+
 
 class Removable:
-    _cache_duration: Optional[int] = None  # seconds
-    _garbage_collection_timer: Optional[Timer] = None
+    __slots__ = ("_cache_duration", "_garbage_collection_timer")
+
+    _cache_duration: Optional[int]  # milliseconds
+    _garbage_collection_timer: Optional[TimerHandle]
+
+    def __init__(self) -> None:
+        self._cache_duration = None
+        self._garbage_collection_timer = None
+
+    @property
+    def scheduler(self) -> Scheduler:
+        return default_scheduler
 
     def set_cache_duration(self, cache_duration: Optional[int]) -> None:
         """
-        Set the cache duration in seconds.
+        Set the cache duration in milliseconds.
 
         Args:
-            cache_duration (Optional[int]): The cache duration in seconds.
+            cache_duration (Optional[int]): The cache duration in milliseconds.
         """
         self._cache_duration = max(0, cache_duration or 0)
         self.schedule_garbage_collection()
@@ -22,13 +33,13 @@ class Removable:
         if self._garbage_collection_timer:
             self._garbage_collection_timer.cancel()
 
-        self._garbage_collection_timer = Timer(
-            (self._cache_duration or DefaultQueryOptions().cache_duration) / 1000,
+        self._garbage_collection_timer = self.scheduler.call_later(
+            self._cache_duration or DefaultQueryOptions().cache_duration,
             self.on_garbage_collection,
         )
 
     def on_garbage_collection(self) -> None:
-        raise NotImplementedError
+        self._garbage_collection_timer = None
 
     def cancel_garbage_collection(self) -> None:
         if self._garbage_collection_timer:
@@ -1,52 +1,57 @@
-import asyncio
+import random
 from typing import Awaitable, Callable, Optional
 
+from .scheduler import Scheduler, default_scheduler
 from .type import TData
 
 
 class RetryResolver:
-    is_running: bool = False
-    on_cancel: Optional[Callable[[], Awaitable[None]]] = None
+    """
+    Resolves a fetcher with retries. Cancelling the task running `resolve`
+    stops it, whether it is waiting for the fetcher or for a retry delay.
+    """
+
+    def __init__(self, scheduler: Optional[Scheduler] = None):
+        self.scheduler = scheduler if scheduler is not None else default_scheduler
 
     async def resolve(
         self,
         fetcher: Callable[[], Awaitable[TData]],
         on_resolve: Callable[[TData], Awaitable[None]],
         on_error: Callable[[Exception], Awaitable[None]],
-        on_cancel: Callable[[], Awaitable[None]],
         retry_count: int = 3,
         retry_delay: int = 1500,
+        max_retry_delay: int = 30000,
+        get_pause: Optional[Callable[[], float]] = None,
     ):
-        self.on_cancel = on_cancel
-        if self.is_running:
-            return
-        self.is_running = True
-
+        """
+        Call `fetcher` up to `retry_count` times. Retries back off
+        exponentially from `retry_delay` with jitter, and wait at least
+        `get_pause()` milliseconds.
+        """
         attempts = 0
-        while attempts != retry_count:
+        while attempts < max(retry_count, 1):
             attempts += 1
 
-            if not self.is_running:
-                return
-
-            is_last_attempt = attempts == retry_count
+            is_last_attempt = attempts >= retry_count
             try:
                 value = await fetcher()
-                if not self.is_running:
-                    return
                 await on_resolve(value)
                 break
             except Exception as error:
                 if is_last_attempt:
                     await on_error(error)
                     break
-                await asyncio.sleep(retry_delay / 1000)
-        self.reset()
-
-    async def cancel(self):
-        self.is_running = False
-        if self.on_cancel:
-            await self.on_cancel()
-
-    def reset(self):
-        self.is_running = False
+                delay = self.get_retry_delay(attempts, retry_delay, max_retry_delay)
+                if get_pause is not None:
+                    delay = max(delay, get_pause())
+                await self.scheduler.sleep(delay)
+
+    @staticmethod
+    def get_retry_delay(
+        attempt: int,
+        retry_delay: int,
+        max_retry_delay: int,
+    ) -> float:
+        delay = min(retry_delay * 2 ** (attempt - 1), max_retry_delay)
+        return delay * random.uniform(0.5, 1)
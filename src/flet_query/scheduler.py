@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+import heapq
+import inspect
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class TimerHandle:
+    __slots__ = ("scheduler", "deadline", "callback", "context", "cancelled", "done")
+
+    def __init__(
+        self,
+        scheduler: "Scheduler",
+        deadline: float,
+        callback: Callable[[], Any],
+        context: contextvars.Context,
+    ) -> None:
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.callback = callback
+        self.context = context
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self) -> None:
+        if self.cancelled or self.done:
+            return
+        self.cancelled = True
+        self.scheduler._on_cancel()
+
+
+class Scheduler:
+    """
+    A heap of deadlines served by a single event loop timer.
+
+    Every delayed callback of the library (garbage collection, refetch
+    intervals, retry delays) goes through one scheduler, so the number of
+    pending timers does not cost threads or sleeping tasks. Delays are in
+    milliseconds. Callbacks run on the event loop, in the context that was
+    current when they were scheduled; coroutine results are run as tasks.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, TimerHandle]] = []
+        self._counter = 0
+        self._cancelled = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wakeup_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def time(self) -> float:
+        """Return the current time of the scheduler clock, in seconds."""
+        return time.monotonic()
+
+    def call_later(
+        self,
+        delay: float,
+        callback: Callable[[], Any],
+    ) -> TimerHandle:
+        handle = TimerHandle(
+            scheduler=self,
+            deadline=self.time() + max(0, delay) / 1000,
+            callback=callback,
+            context=contextvars.copy_context(),
+        )
+
+        loop = self._bind_loop()
+        if loop is not None and not self._is_loop_thread(loop):
+            loop.call_soon_threadsafe(self._push, handle)
+        else:
+            self._push(handle)
+        return handle
+
+    async def sleep(self, delay: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+
+        def wake() -> None:
+            if not future.done():
+                future.set_result(None)
+
+        handle = self.call_later(delay, wake)
+        try:
+            await future
+        finally:
+            handle.cancel()
+
+    def _bind_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._loop
+        if self._loop is None or self._loop.is_closed():
+            self._loop = loop
+            self._wakeup = None
+            self._wakeup_at = None
+        return self._loop
+
+    def _is_loop_thread(self, loop: asyncio.AbstractEventLoop) -> bool:
+        thread_id = getattr(loop, "_thread_id", None)
+        return thread_id is None or thread_id == threading.get_ident()
+
+    def _push(self, handle: TimerHandle) -> None:
+        self._counter += 1
+        heapq.heappush(self._heap, (handle.deadline, self._counter, handle))
+        self._arm()
+
+    def _on_cancel(self) -> None:
+        self._cancelled += 1
+        # Cancelled handles are dropped lazily; compact the heap once they
+        # make up most of it so rescheduling does not grow it without bound.
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _pop(self) -> TimerHandle:
+        _, _, handle = heapq.heappop(self._heap)
+        if handle.cancelled:
+            self._cancelled = max(0, self._cancelled - 1)
+        return handle
+
+    def _arm(self) -> None:
+        while self._heap and self._heap[0][2].cancelled:
+            self._pop()
+
+        if self._loop is None or not self._heap:
+            return
+
+        deadline = self._heap[0][0]
+        if self._wakeup is not None:
+            if self._wakeup_at is not None and self._wakeup_at <= deadline:
+                return
+            self._wakeup.cancel()
+
+        delay = max(0, deadline - self.time())
+        self._wakeup_at = deadline
+        self._wakeup = self._loop.call_later(delay, self._run)
+
+    def _run(self) -> None:
+        self._wakeup = None
+        self._wakeup_at = None
+
+        now = self.time()
+        while self._heap and self._heap[0][0] <= now:
+            handle = self._pop()
+            if handle.cancelled:
+                continue
+            handle.done = True
+            try:
+                result = handle.context.run(handle.callback)
+                if inspect.isawaitable(result):
+                    handle.context.run(asyncio.ensure_future, result)
+            except Exception as error:
+                assert self._loop is not None
+                self._loop.call_exception_handler(
+                    {
+                        "message": "Exception in scheduled callback",
+                        "exception": error,
+                    }
+                )
+
+        self._arm()
+
+
+default_scheduler = Scheduler()
@@ -0,0 +1,84 @@
+import copy
+from typing import Any, Callable, Dict, List, Optional, Union
+
+StructuralSharing = Union[bool, Callable[[Optional[Any], Any], Any]]
+
+
+def replace_equal_deep(old: Any, new: Any) -> Any:
+    """
+    Return `new` with every part that is equal to `old` replaced by the
+    object from `old`.
+
+    Dicts, lists and tuples are compared recursively, so unchanged
+    sub-objects keep their identity. When everything is equal, `old` itself
+    is returned. Subclasses such as `OrderedDict` or `defaultdict` keep their
+    type; those that cannot be copied are returned as `new`.
+    """
+    if old is new:
+        return old
+
+    if type(old) is not type(new):
+        return new
+
+    if isinstance(new, dict):
+        shared = {}
+        is_equal = len(old) == len(new)
+        for key, value in new.items():
+            if key in old:
+                value = replace_equal_deep(old[key], value)
+                is_equal = is_equal and value is old[key]
+            else:
+                is_equal = False
+            shared[key] = value
+        if is_equal:
+            return old
+        return shared if type(new) is dict else _rebuild(new, shared)
+
+    if isinstance(new, (list, tuple)):
+        items = [
+            replace_equal_deep(old[index], value) if index < len(old) else value
+            for index, value in enumerate(new)
+        ]
+        is_equal = len(old) == len(new) and all(
+            item is old_item for item, old_item in zip(items, old)
+        )
+        if is_equal:
+            return old
+        if isinstance(new, list):
+            return items if type(new) is list else _rebuild(new, items)
+        try:
+            if hasattr(new, "_fields"):
+                return type(new)(*items)
+            return type(new)(items)
+        except Exception:
+            return new
+
+    try:
+        return old if old == new else new
+    except Exception:
+        return new
+
+
+def _rebuild(new: Any, shared: Union[Dict[Any, Any], List[Any]]) -> Any:
+    """Return a copy of the dict or list subclass `new` holding `shared`."""
+    try:
+        rebuilt = copy.copy(new)
+        if isinstance(new, dict):
+            rebuilt.update(shared)
+        else:
+            rebuilt[:] = shared
+    except Exception:
+        return new
+    return rebuilt
+
+
+def share_data(
+    structural_sharing: StructuralSharing,
+    old: Optional[Any],
+    new: Any,
+) -> Any:
+    if structural_sharing is False:
+        return new
+    if structural_sharing is True:
+        return replace_equal_deep(old, new)
+    return structural_sharing(old, new)
@@ -0,0 +1,209 @@
+"""
+Headless benchmarks for flet_query.
+
+Run with `python -m flet_query.tests.benchmarks`. Pass `--json out.json` to
+save the results and `--compare out.json` to print the change against a
+previous run, e.g. one taken on another version.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from flet_query.hooks.use_query import UseQueryOptions, use_query
+from flet_query.hooks.use_query_client import set_query_client
+from flet_query.observer import Observer
+from flet_query.tests.harness import FakeClock, create_client, fake_page
+from flet_query.type import DispatchAction
+
+# name -> (unit, higher is better)
+UNITS: Dict[str, Tuple[str, bool]] = {
+    "dispatch_throughput": ("ops/s", True),
+    "invalidate_100k_keys": ("ms", False),
+    "observer_fan_out": ("ms", False),
+    "memory_per_query": ("bytes", False),
+    "redraws_per_fetch": ("updates", False),
+}
+
+
+async def bench_dispatch_throughput(count: int = 100000) -> float:
+    client = create_client(FakeClock())
+    query = client.query_cache.build(("dispatch",), client)
+
+    started_at = time.perf_counter()
+    for index in range(count):
+        await query.dispatch(DispatchAction.success, index)
+    return count / (time.perf_counter() - started_at)
+
+
+async def bench_invalidate(count: int = 100000) -> float:
+    client = create_client(FakeClock())
+    for index in range(count):
+        client.query_cache.build(("items", index), client)
+    # Queries outside the prefix must not be visited.
+    for index in range(count // 10):
+        client.query_cache.build(("other", index), client)
+
+    started_at = time.perf_counter()
+    await client.invalidate_queries(("items",))
+    return (time.perf_counter() - started_at) * 1000
+
+
+async def bench_observer_fan_out(count: int = 1000) -> float:
+    client = create_client(FakeClock())
+    notified = 0
+
+    def listener():
+        nonlocal notified
+        notified += 1
+
+    async def fetcher():
+        return 1
+
+    with fake_page():
+        observers = []
+        for _ in range(count):
+            observer = client_observer(client, ("fan_out",), fetcher)
+            observer.subscribe(listener)
+            observer.query.subscribe(observer)
+            observers.append(observer)
+        query = observers[0].query
+
+        started_at = time.perf_counter()
+        await query.dispatch(DispatchAction.success, 1)
+        client.notify_manager.flush()
+        elapsed = (time.perf_counter() - started_at) * 1000
+
+    assert notified == count, notified
+    return elapsed
+
+
+async def bench_memory_per_query(count: int = 10000) -> float:
+    client = create_client(FakeClock())
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for index in range(count):
+        query = client.query_cache.build(("memory", index), client)
+        await query.dispatch(DispatchAction.success, index)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return size / count
+
+
+async def bench_redraws_per_fetch(count: int = 10) -> float:
+    """Page updates for `count` hooks of one key, from mount to data."""
+
+    async def fetcher():
+        await asyncio.sleep(0)
+        return ["data"]
+
+    with fake_page() as page:
+        set_query_client(create_client(FakeClock()), page)
+        for _ in range(count):
+            use_query(("redraws",), fetcher)
+        await page.idle()
+        return page.updates
+
+
+def client_observer(client, query_key, fetcher) -> Observer:
+    return Observer(
+        query_key=query_key,
+        fetcher=fetcher,
+        client=client,
+        options=UseQueryOptions(
+            enabled=True,
+            refetch_on_mount=None,
+            stale_duration=None,
+            cache_duration=None,
+            refetch_interval=None,
+        ),
+    )
+
+
+BENCHMARKS: Dict[str, Callable[[], Awaitable[float]]] = {
+    "dispatch_throughput": bench_dispatch_throughput,
+    "invalidate_100k_keys": bench_invalidate,
+    "observer_fan_out": bench_observer_fan_out,
+    "memory_per_query": bench_memory_per_query,
+    "redraws_per_fetch": bench_redraws_per_fetch,
+}
+
+
+def get_version() -> str:
+    try:
+        return metadata.version("flet-query")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def run(names: Optional[List[str]] = None, repeat: int = 3) -> Dict[str, Any]:
+    """Run the benchmarks, keeping the best of `repeat` runs of each."""
+    results = {}
+    for name in names or list(BENCHMARKS):
+        _, higher_is_better = UNITS[name]
+        values = [asyncio.run(BENCHMARKS[name]()) for _ in range(repeat)]
+        results[name] = max(values) if higher_is_better else min(values)
+        gc.collect()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "version": get_version(),
+        "results": results,
+    }
+
+
+def print_results(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]):
+    print(
+        f"flet-query {report['version']}, "
+        f"Python {report['python']} on {report['platform']}"
+    )
+    for name, value in report["results"].items():
+        unit, higher_is_better = UNITS[name]
+        line = f"{name:<24} {value:>14.1f} {unit}"
+        previous = (baseline or {}).get("results", {}).get(name)
+        if previous:
+            change = (value - previous) / previous * 100
+            if change == 0:
+                line += "   unchanged"
+            else:
+                better = change > 0 if higher_is_better else change < 0
+                line += f"   {change:+.1f}% {'better' if better else 'worse'}"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("names", nargs="*", help=", ".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--compare", help="compare with results saved earlier")
+    args = parser.parse_args(argv)
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+
+    report = run(args.names, args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_results(report, baseline)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# The demo app starts Flet when imported; run it with `python -m` instead.
+collect_ignore = ["test_use_query.py"]
@@ -0,0 +1,139 @@
+import asyncio
+import functools
+from contextlib import contextmanager
+from typing import Any, Callable, Coroutine, Iterator, Optional, Set
+
+from flet_core.control_event import ControlEvent
+from flet_core.event_handler import EventHandler
+from flet_core.page import AppLifecycleStateChangeEvent, _session_page
+from flet_core.session_storage import SessionStorage
+
+from flet_query.hooks.use_query import UseQueryOptions
+from flet_query.observer import Observer
+from flet_query.query_cache import QueryCache
+from flet_query.query_client import QueryClient
+from flet_query.scheduler import Scheduler
+
+
+class FakePage:
+    """
+    Stands in for `ft.Page` in headless runs: tasks run on the current event
+    loop and `update()` calls are only counted.
+    """
+
+    def __init__(self) -> None:
+        self.updates = 0
+        self.tasks: Set["asyncio.Task[Any]"] = set()
+        self.on_app_lifecycle_state_change = EventHandler(
+            AppLifecycleStateChangeEvent
+        )
+        self.session = SessionStorage(self)
+        self.on_connect = EventHandler()
+        self.on_disconnect = EventHandler()
+        self.on_close = EventHandler()
+
+    def update(self, *controls: Any) -> None:
+        self.updates += 1
+
+    def run_task(self, handler: Callable[..., Any], *args: Any, **kwargs: Any):
+        task = asyncio.ensure_future(handler(*args, **kwargs))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def trigger(self, name: str, data: str = "") -> None:
+        """Fire a page event, e.g. `trigger("app_lifecycle_state_change", "hide")`."""
+        handler: EventHandler = getattr(self, f"on_{name}")
+        event = ControlEvent("page", name, data, None, self)  # type: ignore[arg-type]
+        # Flet runs page event handlers with the page as the current page.
+        token = _session_page.set(self)  # type: ignore[arg-type]
+        try:
+            await handler.get_handler()(event)
+        finally:
+            _session_page.reset(token)
+
+    async def idle(self) -> None:
+        """Wait until every task started with `run_task` is done."""
+        while self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+        # Let the notifications scheduled by the tasks flush.
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+
+class FakeClock(Scheduler):
+    """
+    A scheduler whose time only moves with `advance()`, so refetch intervals,
+    retry delays and garbage collection run without waiting.
+    """
+
+    def __init__(self, now: float = 0) -> None:
+        super().__init__()
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def _arm(self) -> None:
+        while self._heap and self._heap[0][2].cancelled:
+            self._pop()
+
+    async def advance(self, delay: float) -> None:
+        """Move the clock `delay` milliseconds forward, running due callbacks."""
+        deadline = self.now + delay / 1000
+        while self._heap and self._heap[0][0] <= deadline:
+            self.now = max(self.now, self._heap[0][0])
+            self._run()
+            await asyncio.sleep(0)
+        self.now = deadline
+        await asyncio.sleep(0)
+
+
+@contextmanager
+def fake_page(page: Optional[FakePage] = None) -> Iterator[FakePage]:
+    """Make `ft.context.page` return a `FakePage` inside the block."""
+    page = page or FakePage()
+    token = _session_page.set(page)  # type: ignore[arg-type]
+    try:
+        yield page
+    finally:
+        _session_page.reset(token)
+
+
+def create_client(clock: Optional[FakeClock] = None, **kwargs: Any) -> QueryClient:
+    """Create a client with its own cache, on `clock` if given."""
+    kwargs.setdefault("query_cache", QueryCache())
+    return QueryClient(scheduler=clock, **kwargs)
+
+
+def create_observer(
+    client: QueryClient,
+    query_key: Any,
+    fetcher: Callable[..., Any],
+    **options: Any,
+) -> Observer:
+    """Create an observer with the keyword arguments of `use_query` as options."""
+    options.setdefault("enabled", True)
+    return Observer(
+        query_key=query_key,
+        fetcher=fetcher,
+        client=client,
+        options=UseQueryOptions(**options),
+    )
+
+
+async def advance(clock: FakeClock, page: FakePage, delay: int, step: int = 500):
+    """Move the clock in steps, letting the fetches started on the way settle."""
+    for _ in range(delay // step):
+        await clock.advance(step)
+        await page.idle()
+
+
+def run_async(test: Callable[..., Coroutine[Any, Any, None]]) -> Callable[..., None]:
+    """Run an async test function on a new event loop."""
+
+    @functools.wraps(test)
+    def wrapper(*args: Any, **kwargs: Any) -> None:
+        asyncio.run(test(*args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,64 @@
+"""Tests of the batch fetchers registered on a client."""
+
+import asyncio
+from typing import List
+
+from flet_query.tests.harness import FakeClock, create_client, run_async
+
+
+async def unused_fetcher():
+    raise AssertionError("keys under a batch fetcher prefix are loaded in batches")
+
+
+async def fetch_all(client, clock: FakeClock, keys: List[tuple]):
+    """Fetch `keys` together and let the batch window pass."""
+    queries = []
+    for key in keys:
+        query = client.query_cache.build(key, client)
+        query.retry_count = 1
+        queries.append(query)
+    fetches = [asyncio.ensure_future(query.fetch(unused_fetcher)) for query in queries]
+    for _ in range(10):
+        await asyncio.sleep(0)
+    await clock.advance(5)
+    await asyncio.gather(*fetches)
+    return queries
+
+
+@run_async
+async def test_keys_requested_together_are_loaded_in_one_call():
+    clock = FakeClock()
+    client = create_client(clock)
+    batches = []
+
+    async def load_users(keys):
+        batches.append(keys)
+        return {("user", 1): "Ada", ("user", 2): ValueError("gone")}
+
+    client.register_batch_fetcher(("user",), load_users, window=5)
+    first, second, third = await fetch_all(
+        client, clock, [("user", 1), ("user", 2), ("user", 3)]
+    )
+
+    assert batches == [[("user", 1), ("user", 2), ("user", 3)]]
+    assert first.state.is_success and first.state.data == "Ada"
+    # A returned exception or a missing key fails only that key.
+    assert isinstance(second.state.error, ValueError)
+    assert isinstance(third.state.error, KeyError)
+
+
+@run_async
+async def test_batches_are_split_at_max_batch_and_sequences_follow_key_order():
+    clock = FakeClock()
+    client = create_client(clock)
+    batches = []
+
+    async def load_posts(keys):
+        batches.append(keys)
+        return [f"post {key[1]}" for key in keys]
+
+    client.register_batch_fetcher(("post",), load_posts, max_batch=2, window=5)
+    queries = await fetch_all(client, clock, [("post", index) for index in range(3)])
+
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert [query.state.data for query in queries] == ["post 0", "post 1", "post 2"]
@@ -0,0 +1,155 @@
+"""
+Tests of `SqliteCacheBackend` and of the caches of several workers sharing
+one database.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Callable, Iterator, List
+
+import pytest
+
+from flet_query.cache_backend import SqliteCacheBackend
+from flet_query.persister import DehydratedQuery
+from flet_query.query_cache import QueryCache
+from flet_query.query_client import QueryClient
+from flet_query.tests.harness import (
+    FakeClock,
+    create_client,
+    create_observer,
+    fake_page,
+    run_async,
+)
+from flet_query.type import CacheChangeType
+
+
+@pytest.fixture
+def create_worker(tmp_path) -> Iterator[Callable[[FakeClock], QueryClient]]:
+    """Create the clients of worker processes sharing one database."""
+    backends: List[SqliteCacheBackend] = []
+
+    def create(clock: FakeClock) -> QueryClient:
+        backend = SqliteCacheBackend(str(tmp_path / "cache.db"), scheduler=clock)
+        backends.append(backend)
+        return create_client(clock, query_cache=QueryCache(backend=backend))
+
+    yield create
+    for backend in backends:
+        backend.close()
+
+
+async def settle(client: QueryClient) -> None:
+    """Wait for the backend calls queued on the worker thread of `client`."""
+    backend = client.query_cache.backend
+    assert backend is not None
+    await backend.run(lambda: None)
+    await asyncio.sleep(0)
+
+
+@run_async
+async def test_a_new_worker_is_served_from_the_backend(create_worker):
+    clock = FakeClock()
+    first = create_worker(clock)
+    await first.set_query_data(("hot",), lambda _: ["shared"])
+    await settle(first)
+
+    second = create_worker(clock)
+    calls: List[int] = []
+
+    async def fetcher():
+        calls.append(1)
+        return ["fetched"]
+
+    with fake_page() as page:
+        observer = create_observer(second, ("hot",), fetcher, stale_duration=60000)
+        await observer.initialize()
+        await page.idle()
+
+    assert calls == []
+    assert observer.query.state.data == ["shared"]
+
+
+@run_async
+async def test_invalidations_of_another_worker_refetch_mounted_queries(
+    create_worker,
+):
+    clock = FakeClock()
+    first = create_worker(clock)
+    second = create_worker(clock)
+    calls = 0
+
+    async def fetcher():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    with fake_page() as page:
+        observer = create_observer(second, ("feed",), fetcher)
+        await observer.initialize()
+        await page.idle()
+        assert observer.query.state.data == 1
+
+        await first.invalidate_queries(("feed",))
+        await settle(first)
+        # The backend of the second worker polls the change log.
+        await clock.advance(500)
+        await settle(second)
+        await page.idle()
+
+    assert calls == 2
+    assert observer.query.state.data == 2
+
+
+def test_sqlite_backend_invalidates_exactly_the_keys_under_a_prefix(tmp_path):
+    first = SqliteCacheBackend(str(tmp_path / "cache.db"))
+    second = SqliteCacheBackend(str(tmp_path / "cache.db"))
+    updated_at = datetime(2024, 1, 1)
+    try:
+        for key in [("user", 1), ("user", 1, "posts"), ("user", 10), ("users",)]:
+            first.set(DehydratedQuery(key, list(key), updated_at))
+        assert second.get(("user", 1)) == DehydratedQuery(
+            ("user", 1), ["user", 1], updated_at
+        )
+
+        first.invalidate(("user", 1))
+        assert first.get(("user", 1)) is None
+        assert first.get(("user", 1, "posts")) is None
+        assert first.get(("user", 10)) is not None
+        first.invalidate(("users",), exact=True)
+        assert first.get(("users",)) is None
+
+        # Each backend only reports the changes made by the others.
+        assert first.poll() == []
+        assert [change.type for change in second.poll()] == [
+            CacheChangeType.set
+        ] * 4 + [CacheChangeType.invalidate] * 2
+        assert second.poll() == []
+    finally:
+        first.close()
+        second.close()
+
+
+@run_async
+async def test_results_are_written_to_the_backend_once(create_worker):
+    client = create_worker(FakeClock())
+    backend = client.query_cache.backend
+    writes = []
+    set_entry = backend.set
+
+    def record_set(entry):
+        writes.append(entry.key)
+        set_entry(entry)
+
+    backend.set = record_set
+
+    query = client.query_cache.build(("report",), client)
+
+    async def fetcher():
+        return {"total": 3}
+
+    await query.fetch(fetcher)
+    await query.fetch(fetcher)
+    await settle(client)
+
+    assert writes == [("report",)]
+    assert backend.get(("report",)).data == {"total": 3}
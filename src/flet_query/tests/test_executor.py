@@ -0,0 +1,50 @@
+"""Tests of synchronous fetchers and transforms run on the client executors."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flet_query.tests.harness import FakeClock, create_client, run_async
+
+
+@run_async
+async def test_synchronous_fetchers_run_off_the_event_loop():
+    client = create_client(FakeClock())
+    threads = []
+
+    def fetch_sync():
+        threads.append(threading.current_thread())
+        return "sync"
+
+    async def fetch_async():
+        threads.append(threading.current_thread())
+        return "async"
+
+    sync_query = client.query_cache.build(("sync",), client)
+    async_query = client.query_cache.build(("async",), client)
+    assert await sync_query.fetch(fetch_sync) == "sync"
+    assert await async_query.fetch(fetch_async) == "async"
+
+    assert threads[0].name.startswith("flet-query")
+    assert threads[1] is threading.main_thread()
+    client.executor.shutdown()
+
+
+@run_async
+async def test_transforms_run_on_the_transform_executor_before_caching():
+    transform_executor = ThreadPoolExecutor(thread_name_prefix="transform")
+    client = create_client(FakeClock(), transform_executor=transform_executor)
+    query = client.query_cache.build(("parsed",), client)
+    threads = []
+
+    def parse(raw):
+        threads.append(threading.current_thread().name)
+        return raw.split(",")
+
+    async def fetcher():
+        return "a,b"
+
+    query.transform = parse
+    assert await query.fetch(fetcher) == ["a", "b"]
+    assert query.state.data == ["a", "b"]
+    assert threads[0].startswith("transform")
+    transform_executor.shutdown()
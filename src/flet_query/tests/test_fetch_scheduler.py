@@ -0,0 +1,70 @@
+"""Tests of the client-wide `FetchScheduler`."""
+
+import asyncio
+
+from flet_query.fetch_scheduler import FetchScheduler
+from flet_query.tests.harness import run_async
+from flet_query.type import FetchPriority
+
+
+async def hold_slot(scheduler, key, priority, started, release):
+    async with scheduler.slot(key, priority):
+        started.append(key)
+        await release.wait()
+
+
+@run_async
+async def test_waiting_fetches_start_in_priority_order_under_the_cap():
+    scheduler = FetchScheduler(max_concurrent=1)
+    started = []
+    release = asyncio.Event()
+
+    tasks = [
+        asyncio.ensure_future(hold_slot(scheduler, key, priority, started, release))
+        for key, priority in [
+            (("running",), FetchPriority.visible),
+            (("poll",), FetchPriority.background),
+            (("prefetch",), FetchPriority.prefetch),
+            (("screen",), FetchPriority.visible),
+        ]
+    ]
+    await asyncio.sleep(0)
+    assert started == [("running",)]
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert started == [("running",), ("screen",), ("prefetch",), ("poll",)]
+    assert scheduler.active == 0
+
+
+@run_async
+async def test_a_prefix_limit_does_not_hold_back_other_keys():
+    scheduler = FetchScheduler(prefix_limits={("search",): 1})
+    started = []
+    release = asyncio.Event()
+
+    tasks = [
+        asyncio.ensure_future(
+            hold_slot(scheduler, key, FetchPriority.visible, started, release)
+        )
+        for key in [("search", "a"), ("search", "b"), ("user", 1)]
+    ]
+    await asyncio.sleep(0)
+    assert started == [("search", "a"), ("user", 1)]
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert started[-1] == ("search", "b")
+
+
+def test_consecutive_failures_open_the_circuit_of_the_prefix():
+    scheduler = FetchScheduler(failure_threshold=2, cooldown=1000)
+
+    scheduler.record_failure(("api", 1))
+    scheduler.record_success(("api", 2))
+    scheduler.record_failure(("api", 3))
+    assert scheduler.get_pause(("api", 4)) == 0
+
+    scheduler.record_failure(("api", 5))
+    assert 0 < scheduler.get_pause(("api", 6)) <= 1000
+    assert scheduler.get_pause(("other",)) == 0
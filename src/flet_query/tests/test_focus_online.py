@@ -0,0 +1,112 @@
+"""
+Tests of polling paused while pages are hidden or offline, and of the
+revalidation of active queries when they come back.
+"""
+
+from typing import Dict
+
+from flet_query.tests.harness import (
+    FakeClock,
+    advance,
+    create_client,
+    create_observer,
+    fake_page,
+    run_async,
+)
+
+
+@run_async
+async def test_a_hidden_page_pauses_only_its_own_observers():
+    clock = FakeClock()
+    client = create_client(clock)
+    calls: Dict[str, int] = {"first": 0, "second": 0}
+
+    def create_fetcher(name: str):
+        async def fetcher():
+            calls[name] += 1
+            return calls[name]
+
+        return fetcher
+
+    with fake_page() as first:
+        client.watch_page(first)
+        await create_observer(
+            client, ("first",), create_fetcher("first"), refetch_interval=1000
+        ).initialize()
+    with fake_page() as second:
+        client.watch_page(second)
+        await create_observer(
+            client, ("second",), create_fetcher("second"), refetch_interval=1000
+        ).initialize()
+    await first.idle()
+    await second.idle()
+
+    await first.trigger("app_lifecycle_state_change", "hide")
+    await second.trigger("disconnect")
+    await second.trigger("connect")
+    assert not client.is_paused
+    await advance(clock, second, 3000)
+    assert calls == {"first": 1, "second": 4}
+
+    await first.trigger("app_lifecycle_state_change", "show")
+    await clock.advance(0)
+    await first.idle()
+    assert calls["first"] == 2
+
+
+@run_async
+async def test_polling_pauses_while_hidden_and_revalidates_on_show():
+    clock = FakeClock()
+    client = create_client(clock)
+    calls = 0
+
+    async def fetcher():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    with fake_page() as page:
+        client.watch_page(page)
+        await create_observer(
+            client, ("feed",), fetcher, refetch_interval=1000
+        ).initialize()
+        await page.idle()
+
+        await page.trigger("app_lifecycle_state_change", "hide")
+        assert client.is_paused
+        await advance(clock, page, 3000)
+        assert calls == 1
+
+        await page.trigger("app_lifecycle_state_change", "show")
+        await clock.advance(0)
+        await page.idle()
+        assert calls == 2
+        await advance(clock, page, 1000)
+        assert calls == 3
+
+
+@run_async
+async def test_reconnects_revalidate_at_most_once_per_throttle():
+    clock = FakeClock()
+    client = create_client(clock, revalidate_throttle=1000)
+    calls = 0
+
+    async def fetcher():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    with fake_page() as page:
+        client.watch_page(page)
+        await create_observer(client, ("feed",), fetcher).initialize()
+        await page.idle()
+
+        for _ in range(2):
+            await page.trigger("disconnect")
+            await page.trigger("connect")
+            await clock.advance(0)
+            await page.idle()
+        assert calls == 2
+
+        await advance(clock, page, 1000)
+        assert calls == 3
@@ -0,0 +1,508 @@
+"""
+Headless tests of the query machinery, run on the harness: a fake page
+stands in for Flet and a fake clock drives every delay.
+
+Run with `python -m pytest src/flet_query/tests`.
+"""
+
+import asyncio
+import gc
+from datetime import datetime, timedelta
+from typing import List
+
+import flet as ft
+
+from flet_query.hooks.use_query import use_query
+from flet_query.hooks.use_query_client import set_query_client, use_query_client
+from flet_query.infinite_query import InfiniteQuery
+from flet_query.persister import DehydratedQuery
+from flet_query.query_cache import QueryCache
+from flet_query.tests.harness import (
+    FakeClock,
+    advance,
+    create_client,
+    create_observer,
+    fake_page,
+    run_async,
+)
+from flet_query.type import DispatchAction, FetchDirection, FetchPriority
+
+
+@run_async
+async def test_concurrent_fetches_share_one_request():
+    client = create_client(FakeClock())
+    query = client.query_cache.build(("dedup",), client)
+    calls = 0
+
+    async def fetcher():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        return "data"
+
+    results = await asyncio.gather(*(query.fetch(fetcher) for _ in range(10)))
+
+    assert calls == 1
+    assert results == ["data"] * 10
+
+
+@run_async
+async def test_observers_of_a_key_share_one_poll_loop():
+    clock = FakeClock()
+    client = create_client(clock)
+    calls = 0
+
+    async def fetcher():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    with fake_page() as page:
+        for index in range(30):
+            observer = create_observer(
+                client,
+                ("poll",),
+                fetcher,
+                refetch_interval=1000 + index * 100,
+            )
+            await observer.initialize()
+        await page.idle()
+        calls = 0
+
+        await advance(clock, page, 5000)
+
+    assert calls == 5
+
+
+@run_async
+async def test_polling_backs_off_while_data_is_unchanged():
+    clock = FakeClock()
+    client = create_client(clock)
+    value = "same"
+    poll_times: List[float] = []
+
+    async def fetcher():
+        poll_times.append(clock.now)
+        return value
+
+    with fake_page() as page:
+        observer = create_observer(
+            client,
+            ("backoff",),
+            fetcher,
+            refetch_interval=1000,
+            refetch_backoff=2,
+            max_refetch_interval=4000,
+        )
+        await observer.initialize()
+        await page.idle()
+        await advance(clock, page, 15000)
+        assert poll_times == [0, 1, 3, 7, 11, 15]
+
+        value = "changed"
+        await advance(clock, page, 8000)
+        # The changed response at 19 s drops the delay back to 1 s.
+        assert poll_times[-3:] == [19, 20, 22]
+
+
+@run_async
+async def test_polling_with_a_function_of_the_state_stops_on_none():
+    clock = FakeClock()
+    client = create_client(clock)
+    calls = 0
+
+    async def fetcher():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    with fake_page() as page:
+        observer = create_observer(
+            client,
+            ("until",),
+            fetcher,
+            refetch_interval=lambda state: None if (state.data or 0) >= 3 else 500,
+        )
+        await observer.initialize()
+        await page.idle()
+        await advance(clock, page, 5000)
+
+    assert calls == 3
+    assert observer.query.poll_timer is None
+
+
+@run_async
+async def test_cancel_interrupts_the_fetcher_and_passes_a_token():
+    client = create_client(FakeClock())
+    query = client.query_cache.build(("cancel",), client)
+    started = asyncio.Event()
+    tokens = []
+
+    async def fetcher(cancel_token):
+        tokens.append(cancel_token)
+        started.set()
+        await asyncio.sleep(10)
+
+    fetch = asyncio.ensure_future(query.fetch(fetcher))
+    await started.wait()
+    await query.cancel()
+
+    assert await fetch is None
+    assert tokens[0].is_cancelled
+    assert not query.state.is_fetching
+
+
+@run_async
+async def test_cancel_interrupts_the_retry_delay():
+    clock = FakeClock()
+    client = create_client(clock)
+    query = client.query_cache.build(("retry",), client)
+    calls = 0
+
+    async def fetcher():
+        nonlocal calls
+        calls += 1
+        raise ValueError()
+
+    fetch = asyncio.ensure_future(query.fetch(fetcher))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    await client.cancel_queries(("retry",))
+    await fetch
+    await clock.advance(60000)
+
+    assert calls == 1
+    assert not query.state.is_fetching
+
+
+@run_async
+async def test_last_observer_leaving_cancels_the_fetch():
+    client = create_client(FakeClock())
+    cancelled = []
+
+    async def fetcher():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with fake_page() as page:
+        observer = create_observer(client, ("leave",), fetcher)
+        await observer.initialize()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        await observer.destroy()
+        await page.idle()
+
+    assert cancelled == [True]
+
+
+@run_async
+async def test_hook_moves_to_a_new_key_and_cancels_the_old_fetch():
+    clock = FakeClock()
+    client = create_client(clock)
+    cancelled = []
+    fetched = []
+
+    class Posts(ft.Column):
+        def query(self, search: str, delay: float):
+            async def fetcher():
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    cancelled.append(search)
+                    raise
+                fetched.append(search)
+                return search
+
+            return use_query(
+                ("posts", search),
+                fetcher,
+                refetch_interval=1000,
+                control=self,
+            )
+
+    with fake_page() as page:
+        set_query_client(client, page)
+        control = Posts()
+        result = control.query("a", 5)
+        control.did_mount()
+        await asyncio.sleep(0.01)
+        assert control.query("b", 0) is result
+        control.query("c", 0)
+        await page.idle()
+        fetched.clear()
+        await advance(clock, page, 1000)
+
+    assert cancelled == ["a"]
+    assert result.data == "c"
+    assert fetched == ["c"]
+    assert not client.query_cache.queries[("posts", "a")].observers
+
+
+@run_async
+async def test_rebuilt_hook_applies_its_new_select():
+    async def fetcher():
+        return [1, 2, 3, 4, 5]
+
+    class Items(ft.Column):
+        def query(self, limit: int):
+            return use_query(
+                ("items",),
+                fetcher,
+                select=lambda data: data[:limit],
+                control=self,
+            )
+
+    with fake_page() as page:
+        set_query_client(create_client(FakeClock()), page)
+        control = Items()
+        result = control.query(2)
+        control.did_mount()
+        await page.idle()
+        assert result.data == [1, 2]
+
+        assert control.query(4) is result
+        assert result.data == [1, 2, 3, 4]
+
+
+@run_async
+async def test_eviction_skips_queries_of_unmounted_hooks():
+    client = create_client(FakeClock(), query_cache=QueryCache(max_queries=3))
+
+    async def fetcher():
+        return 1
+
+    with fake_page() as page:
+        set_query_client(client, page)
+        controls = []
+        for index in range(6):
+            control = ft.Column()
+            use_query(("row", index), fetcher, control=control)
+            controls.append(control)
+        assert client.query_cache.stats.evictions == 0
+
+        for control in controls:
+            control.will_unmount()
+        controls.clear()
+        gc.collect()
+        client.query_cache.evict()
+
+    assert client.query_cache.stats.evictions == 3
+    assert list(client.query_cache.queries) == [("row", 3), ("row", 4), ("row", 5)]
+
+
+@run_async
+async def test_hydrate_restores_data_without_overwriting_newer_data():
+    source = create_client(FakeClock())
+    await source.set_query_data(("user", 1), lambda _: {"name": "Ada"})
+    dehydrated = source.dehydrate(("user",))
+
+    client = create_client(FakeClock())
+    client.hydrate(dehydrated)
+    assert client.get_query_data(("user", 1)) == {"name": "Ada"}
+
+    await client.set_query_data(("user", 1), lambda _: {"name": "Grace"})
+    old = DehydratedQuery(
+        key=("user", 1),
+        data={"name": "Ada"},
+        data_updated_at=datetime.now() - timedelta(hours=1),
+    )
+    client.hydrate([old])
+    assert client.get_query_data(("user", 1)) == {"name": "Grace"}
+
+
+@run_async
+async def test_hooks_of_one_key_update_the_page_in_batches():
+    async def fetcher():
+        await asyncio.sleep(0)
+        return ["data"]
+
+    with fake_page() as page:
+        set_query_client(create_client(FakeClock()), page)
+        results = [use_query(("batched",), fetcher) for _ in range(10)]
+        await page.idle()
+
+    assert all(result.data == ["data"] for result in results)
+    assert page.updates <= 2
+
+
+@run_async
+async def test_bulk_updates_notify_each_observer_and_the_cache_once():
+    client = create_client(FakeClock())
+    events = []
+    client.query_cache.subscribe(events.append)
+    notified = 0
+
+    def listener():
+        nonlocal notified
+        notified += 1
+
+    async def fetcher():
+        return 0
+
+    with fake_page():
+        observer = create_observer(client, ("item", 1), fetcher, enabled=False)
+        await observer.initialize()
+        observer.subscribe(listener)
+        events.clear()
+
+        await client.set_queries_data({("item", i): i for i in range(100)})
+        client.notify_manager.flush()
+        await client.set_queries_data(("item",), lambda data: data + 1)
+        client.notify_manager.flush()
+
+    assert len(events) == 2
+    assert len(events[0].queries) == 100
+    assert notified == 2
+    assert client.get_queries_data(("item",))[("item", 5)] == 6
+
+    client.remove_queries(("item",))
+    assert not client.query_cache.queries
+
+
+@run_async
+async def test_select_skips_redraws_when_the_selected_value_is_unchanged():
+    clock = FakeClock()
+    calls = 0
+
+    async def fetcher():
+        nonlocal calls
+        calls += 1
+        return {"items": [calls, 2, 3]}
+
+    with fake_page() as page:
+        set_query_client(create_client(clock), page)
+        result = use_query(
+            ("select",),
+            fetcher,
+            refetch_interval=1000,
+            select=lambda data: len(data["items"]),
+        )
+        await page.idle()
+        updates = page.updates
+        await advance(clock, page, 5000)
+
+    assert calls == 6
+    assert result.data == 3
+    assert page.updates == updates
+
+
+@run_async
+async def test_closed_sessions_release_shared_queries():
+    clock = FakeClock()
+    shared = create_client(clock)
+    pages = []
+
+    async def fetcher():
+        return 1
+
+    for _ in range(10):
+        with fake_page() as page:
+            set_query_client(create_client(clock, shared_client=shared), page)
+            use_query(("public",), fetcher, shared=True)
+            await page.idle()
+            pages.append(page)
+    query = shared.query_cache.queries[("public",)]
+    assert len(query.observers) == 10
+
+    for page in pages[:5]:
+        await page.trigger("disconnect")
+    assert len(query.observers) == 5
+    await pages[0].trigger("connect")
+    assert len(query.observers) == 6
+
+    for page in pages:
+        await page.trigger("close")
+    assert not query.observers
+
+
+@run_async
+async def test_closing_a_session_leaves_other_sessions_of_a_global_client():
+    client = create_client(FakeClock(), shared_client=create_client(FakeClock()))
+    set_query_client(client)
+
+    async def fetcher():
+        return 1
+
+    try:
+        with fake_page() as first:
+            use_query(("own",), fetcher)
+            use_query(("public",), fetcher, shared=True)
+            await first.idle()
+        with fake_page() as second:
+            use_query(("own",), fetcher)
+            use_query(("public",), fetcher, shared=True)
+            await second.idle()
+    finally:
+        set_query_client(None)
+    own = client.query_cache.queries[("own",)]
+    public = client.shared_client.query_cache.queries[("public",)]
+
+    await first.trigger("disconnect")
+    assert [len(own.observers), len(public.observers)] == [2, 1]
+    await first.trigger("close")
+    assert [len(own.observers), len(public.observers)] == [1, 1]
+    assert all(observer.page is second for observer in own.observers)
+
+
+@run_async
+async def test_session_clients_share_one_executor():
+    executors = set()
+
+    def fetcher():
+        return 1
+
+    for index in range(5):
+        with fake_page() as page:
+            use_query(("sync", index), fetcher)
+            await page.idle()
+            executors.add(use_query_client().executor)
+            await page.trigger("close")
+
+    assert len(executors) == 1
+
+
+@run_async
+async def test_page_requests_wait_for_a_running_refetch():
+    client = create_client(FakeClock())
+    query = client.query_cache.build(("pages",), client, query_class=InfiniteQuery)
+    query.initial_page_param = 0
+    query.max_pages = 3
+    query.get_next_page_param = lambda page, pages, param, params: param + 1
+
+    async def fetcher(page_param):
+        await asyncio.sleep(0)
+        return f"page {page_param}"
+
+    await query.fetch(fetcher)
+    poll = asyncio.ensure_future(
+        query.fetch(fetcher, silent=True, priority=FetchPriority.background)
+    )
+    await asyncio.sleep(0)
+    await asyncio.gather(
+        poll,
+        query.fetch(fetcher, direction=FetchDirection.forward),
+        query.fetch(fetcher, direction=FetchDirection.forward),
+    )
+    assert query.state.data.page_params == [0, 1]
+
+    for _ in range(3):
+        await query.fetch(fetcher, direction=FetchDirection.forward)
+    assert query.state.data.page_params == [2, 3, 4]
+
+
+@run_async
+async def test_invalidate_dispatches_in_bulk():
+    client = create_client(FakeClock())
+    for index in range(10):
+        query = client.query_cache.build(("list", index), client)
+        await query.dispatch(DispatchAction.success, index)
+    events = []
+    client.query_cache.subscribe(events.append)
+
+    await client.invalidate_queries(("list",))
+
+    assert len(events) == 1
+    assert all(query.state.is_invalidated for query in events[0].queries)
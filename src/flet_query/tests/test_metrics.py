@@ -0,0 +1,64 @@
+"""Tests of the opt-in `QueryMetrics`."""
+
+import asyncio
+
+from flet_query.metrics import Histogram, QueryMetrics
+from flet_query.tests.harness import (
+    FakeClock,
+    advance,
+    create_client,
+    create_observer,
+    fake_page,
+    run_async,
+)
+
+
+def test_histogram_counts_values_per_bucket():
+    histogram = Histogram(buckets=(10, 100))
+    for value in (5, 10, 50, 500):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.sum == 565
+
+
+@run_async
+async def test_fetches_mounts_and_observers_are_recorded_per_prefix():
+    clock = FakeClock()
+    metrics = QueryMetrics()
+    client = create_client(clock, metrics=metrics)
+    events = []
+    metrics.subscribe(lambda event: events.append(event.name))
+    attempts = 0
+
+    async def fetcher():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ValueError("flaky")
+        return "user"
+
+    with fake_page() as page:
+        first = create_observer(
+            client, ("user", 1), fetcher, stale_duration=60000, retry_delay=100
+        )
+        await first.initialize()
+        # Let the first attempt fail before the retry delay elapses.
+        for _ in range(5):
+            await asyncio.sleep(0)
+        await advance(clock, page, 500)
+        second = create_observer(client, ("user", 1), fetcher, stale_duration=60000)
+        await second.initialize()
+
+    snapshot = metrics.snapshot()[("user",)]
+    assert snapshot["fetches"] == 1
+    assert snapshot["retries"] == 1
+    assert snapshot["errors"] == 0
+    assert snapshot["fetch_latency"]["count"] == 1
+    assert [snapshot["mount_misses"], snapshot["mount_hits"]] == [1, 1]
+    assert snapshot["observers"] == 2
+    assert {"fetch", "retry", "mount", "observers", "notification"} <= set(events)
+
+    metrics.reset()
+    assert metrics.snapshot() == {}
@@ -0,0 +1,99 @@
+"""Tests of mutations: optimistic updates, cache updates and scoped queues."""
+
+import asyncio
+
+import pytest
+
+from flet_query.mutation import Mutation, MutationOptions
+from flet_query.tests.harness import FakeClock, create_client, run_async
+
+
+@run_async
+async def test_failed_mutation_rolls_back_its_optimistic_update():
+    client = create_client(FakeClock())
+    await client.set_query_data(("todos",), lambda _: ["write"])
+    seen = []
+    errors = []
+
+    async def add_todo(title):
+        seen.append(client.get_query_data(("todos",)))
+        raise ValueError(title)
+
+    mutation = Mutation(
+        client,
+        MutationOptions(
+            mutation_fn=add_todo,
+            optimistic_update=lambda title: {("todos",): lambda data: data + [title]},
+            on_mutate=lambda title: "context",
+            on_error=lambda error, title, context: errors.append(context),
+        ),
+    )
+    with pytest.raises(ValueError):
+        await mutation.mutate("test")
+
+    assert seen == [["write", "test"]]
+    assert client.get_query_data(("todos",)) == ["write"]
+    assert errors == ["context"]
+    assert mutation.state.is_error
+
+
+@run_async
+async def test_successful_mutation_updates_and_invalidates_queries():
+    client = create_client(FakeClock())
+    await client.set_query_data(("todos",), lambda _: [])
+
+    async def create_todo(title):
+        return {"id": 1, "title": title}
+
+    mutation = Mutation(
+        client,
+        MutationOptions(
+            mutation_fn=create_todo,
+            update_queries=lambda todo, title: {("todo", todo["id"]): todo},
+            invalidates=[("todos",)],
+        ),
+    )
+    assert await mutation.mutate("ship") == {"id": 1, "title": "ship"}
+
+    assert client.get_query_data(("todo", 1)) == {"id": 1, "title": "ship"}
+    assert client.query_cache.queries[("todos",)].state.is_invalidated
+    assert mutation.state.is_success
+
+
+@run_async
+async def test_scoped_mutations_run_in_order_and_merge_queued_calls():
+    client = create_client(FakeClock())
+    events = []
+
+    async def save(changes):
+        events.append(("start", changes))
+        await asyncio.sleep(0)
+        events.append(("end", changes))
+        return changes
+
+    def create_mutation():
+        return Mutation(
+            client,
+            MutationOptions(
+                mutation_fn=save,
+                scope=("document",),
+                merge=lambda queued, changes: queued + changes,
+            ),
+        )
+
+    rename, edit = create_mutation(), create_mutation()
+    results = await asyncio.gather(
+        rename.mutate(["title"]),
+        edit.mutate(["line 1"]),
+        edit.mutate(["line 2"]),
+    )
+
+    # The second edit is merged into the first, still queued behind rename.
+    assert results == [["title"], ["line 1", "line 2"], ["line 1", "line 2"]]
+    assert events == [
+        ("start", ["title"]),
+        ("end", ["title"]),
+        ("start", ["line 1", "line 2"]),
+        ("end", ["line 1", "line 2"]),
+    ]
+    assert not client.mutation_cache.queues
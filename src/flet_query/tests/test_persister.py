@@ -0,0 +1,74 @@
+"""Tests of `SqlitePersister` and of clients persisted with it."""
+
+from datetime import datetime, timedelta
+
+from flet_query.persister import (
+    DehydratedQuery,
+    QueryPersistence,
+    SqlitePersister,
+    persist_query_client,
+)
+from flet_query.tests.harness import FakeClock, create_client, run_async
+
+
+async def settle(persistence: QueryPersistence) -> None:
+    """Wait for the write started by the last flush to finish."""
+    async with persistence._lock:
+        pass
+
+
+def test_sqlite_persister_saves_loads_and_deletes(tmp_path):
+    persister = SqlitePersister(str(tmp_path / "queries.db"))
+    updated_at = datetime(2024, 1, 1, 12, 0)
+    ada = DehydratedQuery(key=("user", 1), data="Ada", data_updated_at=updated_at)
+    grace = DehydratedQuery(key=("user", 2), data="Grace", data_updated_at=updated_at)
+
+    persister.save([ada, grace])
+    persister.delete([("user", 2)])
+    assert persister.load() == [ada]
+
+    persister.clear()
+    assert persister.load() == []
+
+
+@run_async
+async def test_cache_changes_are_written_once_per_throttle(tmp_path):
+    clock = FakeClock()
+    client = create_client(clock)
+    persister = SqlitePersister(str(tmp_path / "queries.db"))
+    persistence = persist_query_client(client, persister, throttle=1000)
+
+    await client.set_query_data(("todo", 1), lambda _: "write")
+    await client.set_query_data(("todo", 2), lambda _: "test")
+    await clock.advance(999)
+    assert persister.load() == []
+
+    await clock.advance(1)
+    await settle(persistence)
+    assert {query.key: query.data for query in persister.load()} == {
+        ("todo", 1): "write",
+        ("todo", 2): "test",
+    }
+
+    client.remove_queries(("todo", 2))
+    await clock.advance(1000)
+    await settle(persistence)
+    assert [query.key for query in persister.load()] == [("todo", 1)]
+
+
+@run_async
+async def test_restore_skips_queries_older_than_max_age(tmp_path):
+    persister = SqlitePersister(str(tmp_path / "queries.db"))
+    persister.save(
+        [
+            DehydratedQuery(("fresh",), "kept", datetime.now()),
+            DehydratedQuery(("old",), "dropped", datetime.now() - timedelta(days=2)),
+        ]
+    )
+
+    client = create_client(FakeClock())
+    persistence = persist_query_client(client, persister)
+    persistence.unsubscribe()
+
+    assert client.get_query_data(("fresh",)) == "kept"
+    assert client.get_query_data(("old",)) is None
@@ -0,0 +1,72 @@
+"""Tests of `prefetch_query`, `ensure_query_data` and `use_prefetch`."""
+
+import pytest
+
+from flet_query.hooks.use_prefetch import use_prefetch
+from flet_query.hooks.use_query_client import set_query_client
+from flet_query.tests.harness import FakeClock, create_client, fake_page, run_async
+
+
+class CountingFetcher:
+    def __init__(self, error: bool = False) -> None:
+        self.calls = 0
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        if self.error:
+            raise ValueError("unavailable")
+        return self.calls
+
+
+@run_async
+async def test_prefetch_query_fetches_only_stale_data_and_ignores_errors():
+    client = create_client(FakeClock())
+    fetcher = CountingFetcher()
+
+    await client.prefetch_query(("post", 1), fetcher, stale_duration=60000)
+    await client.prefetch_query(("post", 1), fetcher, stale_duration=60000)
+    assert fetcher.calls == 1
+    await client.prefetch_query(("post", 1), fetcher, stale_duration=0)
+    assert fetcher.calls == 2
+
+    failing = CountingFetcher(error=True)
+    client.query_cache.build(("post", 2), client).retry_count = 1
+    await client.prefetch_query(("post", 2), failing)
+    assert client.query_cache.queries[("post", 2)].state.is_error
+
+
+@run_async
+async def test_ensure_query_data_serves_the_cache_and_raises_fetch_errors():
+    client = create_client(FakeClock())
+    fetcher = CountingFetcher()
+
+    assert await client.ensure_query_data(("post", 1), fetcher) == 1
+    assert await client.ensure_query_data(("post", 1), fetcher) == 1
+    assert await client.ensure_query_data(("post", 1), fetcher, stale_duration=0) == 2
+
+    client.query_cache.build(("post", 2), client).retry_count = 1
+    with pytest.raises(ValueError):
+        await client.ensure_query_data(("post", 2), CountingFetcher(error=True))
+
+
+@run_async
+async def test_use_prefetch_prefetches_when_the_pointer_enters():
+    fetcher = CountingFetcher()
+
+    class HoverEvent:
+        name = "hover"
+
+        def __init__(self, data: str) -> None:
+            self.data = data
+
+    with fake_page() as page:
+        set_query_client(create_client(FakeClock()), page)
+        prefetch = use_prefetch(("post", 1), fetcher)
+        prefetch(HoverEvent("false"))
+        await page.idle()
+        assert fetcher.calls == 0
+        prefetch(HoverEvent("true"))
+        await page.idle()
+
+    assert fetcher.calls == 1
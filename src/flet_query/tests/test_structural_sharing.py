@@ -0,0 +1,52 @@
+"""Tests of `replace_equal_deep`, which keeps unchanged data identical."""
+
+from collections import OrderedDict, defaultdict, namedtuple
+
+from flet_query.structural_sharing import replace_equal_deep
+
+Point = namedtuple("Point", ["x", "y"])
+
+
+def test_equal_data_returns_the_old_object():
+    old = {"items": [{"id": 1}, {"id": 2}], "total": 2}
+    new = {"items": [{"id": 1}, {"id": 2}], "total": 2}
+
+    assert replace_equal_deep(old, new) is old
+
+
+def test_unchanged_parts_keep_their_identity():
+    old = {"items": [{"id": 1}, {"id": 2}], "point": Point(1, 2)}
+    new = {"items": [{"id": 1}, {"id": 3}], "point": Point(1, 2)}
+
+    shared = replace_equal_deep(old, new)
+
+    assert shared == new
+    assert shared["items"][0] is old["items"][0]
+    assert shared["point"] is old["point"]
+
+
+def test_changed_dict_subclasses_keep_their_type():
+    old = OrderedDict(a=[1], b=[2])
+    new = OrderedDict(a=[1], b=[3])
+    shared = replace_equal_deep(old, new)
+    assert type(shared) is OrderedDict
+    assert list(shared) == ["a", "b"]
+    assert shared["a"] is old["a"]
+
+    old_counts = defaultdict(list, a=[1])
+    new_counts = defaultdict(list, a=[1], b=[2])
+    shared_counts = replace_equal_deep(old_counts, new_counts)
+    assert type(shared_counts) is defaultdict
+    assert shared_counts.default_factory is list
+    assert shared_counts["a"] is old_counts["a"]
+
+
+def test_changed_list_subclasses_keep_their_type():
+    class Page(list):
+        pass
+
+    old = Page([{"id": 1}, {"id": 2}])
+    shared = replace_equal_deep(old, Page([{"id": 1}, {"id": 3}]))
+
+    assert type(shared) is Page
+    assert shared[0] is old[0]
@@ -0,0 +1,62 @@
+"""Tests of `use_queries` and `QueryClient.fetch_queries`."""
+
+import asyncio
+
+from flet_query.hooks.use_queries import use_queries
+from flet_query.hooks.use_query_client import set_query_client
+from flet_query.tests.harness import FakeClock, create_client, fake_page, run_async
+
+
+class ConcurrencyProbe:
+    """Builds fetchers that record how many of them run at once."""
+
+    def __init__(self) -> None:
+        self.running = 0
+        self.max_running = 0
+
+    def fetcher(self, value):
+        async def fetch():
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            await asyncio.sleep(0)
+            self.running -= 1
+            return value
+
+        return fetch
+
+
+@run_async
+async def test_fetch_queries_returns_data_in_order_within_the_cap():
+    client = create_client(FakeClock())
+    probe = ConcurrencyProbe()
+
+    data = await client.fetch_queries(
+        [(("item", index), probe.fetcher(index)) for index in range(6)],
+        concurrency=2,
+    )
+
+    assert data == list(range(6))
+    assert probe.max_running == 2
+    assert client.get_query_data(("item", 3)) == 3
+
+
+@run_async
+async def test_use_queries_combines_results_and_redraws_once_loaded():
+    probe = ConcurrencyProbe()
+
+    with fake_page() as page:
+        set_query_client(create_client(FakeClock()), page)
+        combined = use_queries(
+            [
+                {"query_key": ("item", index), "fetcher": probe.fetcher(index)}
+                for index in range(4)
+            ],
+            concurrency=1,
+        )
+        assert combined.is_loading
+        await page.idle()
+
+    assert combined.data == [0, 1, 2, 3]
+    assert combined.is_success and not combined.is_loading
+    assert probe.max_running == 1
+    assert page.updates == 1
@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, IntEnum
 from typing import Any, Dict, List, TypeVar
 
 TData = TypeVar("TData")
@@ -23,3 +23,44 @@ class RefetchOnMount(str, Enum):
     always = "always"
     stale = "stale"
     newer = "newer"
+
+
+class EvictionPolicy(str, Enum):
+    lru = "lru"
+    lfu = "lfu"
+
+
+class QueryCacheEventType(str, Enum):
+    added = "added"
+    removed = "removed"
+    updated = "updated"
+
+
+class FetchDirection(str, Enum):
+    forward = "forward"
+    backward = "backward"
+
+
+class MutationStatus(str, Enum):
+    idle = "idle"
+    pending = "pending"
+    success = "success"
+    error = "error"
+
+
+class FetchPriority(IntEnum):
+    visible = 0
+    prefetch = 1
+    background = 2
+
+
+class MountOutcome(str, Enum):
+    hit = "hit"
+    stale_hit = "stale_hit"
+    miss = "miss"
+
+
+class CacheChangeType(str, Enum):
+    set = "set"
+    delete = "delete"
+    invalidate = "invalidate"